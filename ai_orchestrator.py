@@ -1,12 +1,18 @@
 # does the actual orchestration of the AI-driven automation
 
 import asyncio
-from playwright.async_api import async_playwright
-from mcp_context import get_page_context
+from urllib.parse import urlparse
+from browser_pool import BrowserPool
+from mcp_context import ContextTracker, resolve_mcp_id
 from llm_client import LLMClient
-from utils import safe_goto, safe_click, safe_fill
+from plan_recorder import PlanRecorder, stable_selector
+from timeouts import timeouts
+from tracing import span
+from utils import safe_goto, safe_click, safe_fill, wait_for_ready, wait_for_element, wait_for_url_change
 import config
 
+MCP_ID_TIMEOUT = 2000  # ms - a registered element is already on the page, it just has to become actionable
+
 
 class AIOrchestrator:
     """
@@ -16,34 +22,82 @@ class AIOrchestrator:
     3. executes the plan using our automation utilities
     """
     
-    def __init__(self):
+    def __init__(self, pool=None, llm_client=None):
+        # pass in a shared BrowserPool to reuse warm browsers, otherwise we make our own
+        self.pool = pool
+        self.owns_pool = pool is None
+        self.lease = None
         self.browser = None
         self.page = None
-        self.llm_client = LLMClient()
+        self.context_tracker = None
+        self.last_target = None  # selector the last fill/click actually used
+        self.time_to_first_action = None
+        self.last_stable_selector = None
+        # successful runs are recorded as scripts that matching goals replay without the LLM
+        self.recorder = PlanRecorder() if config.RECORD_PLANS else None
+        # orchestrators can share one LLMClient (and its pooled connection)
+        self.owns_llm_client = llm_client is None
+        self.llm_client = llm_client or LLMClient()
     
     async def setup(self):
-        """start the browser"""
+        """lease a page from the browser pool"""
         print("\n[Setup] Starting AI-driven automation...")
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=config.HEADLESS)
-        self.page = await self.browser.new_page()
+        if self.pool is None:
+            self.pool = BrowserPool(size=1)
+        self.lease = await self.pool.acquire()
+        self.browser = self.lease.browser
+        self.page = self.lease.page
+        # keeps the page context up to date from in-page deltas instead of rescanning every time
+        self.context_tracker = ContextTracker(self.page)
         print("[Setup] Browser ready!\n")
     
     async def cleanup(self):
-        """close the browser"""
+        """give the page back to the pool"""
         print("\n[Cleanup] Closing browser...")
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        if self.lease:
+            await self.pool.release(self.lease)
+            self.lease = None
+        if self.pool and self.owns_pool:
+            await self.pool.close()
+            self.pool = None
+        if self.owns_llm_client:
+            await self.llm_client.aclose()
         print("[Cleanup] Done\n")
     
+    async def resolve_target(self, step):
+        """
+        work out which element a fill/click step means, returns (selector, timeout)
+        
+        mcp_ids are looked up in the page's registry - if the element is there we already know
+        it exists, so we only allow a short wait for it to become actionable (never longer than
+        what the timeout manager has learned for this action on this site). steps without a
+        registered id fall back to their CSS selector, and the timeout manager picks the timeout
+        """
+        if "mcp_id" in step:
+            selector = await resolve_mcp_id(self.page, step["mcp_id"])
+            if selector:
+                return selector, min(MCP_ID_TIMEOUT, timeouts.timeout_for(step.get("action"), self.page.url))
+            print(f"    [Failure] mcp_id {step['mcp_id']} is not on the page")
+        
+        if step.get("selector"):
+            return step["selector"], None
+        return None, None
+    
     async def execute_step(self, step):
         """execute a single action from the AI's plan"""
+        with span("plan_step", action=step.get("action")) as s:
+            success = await self._execute_step(step)
+            if not success:
+                s.set(outcome="failure")
+            return success
+    
+    async def _execute_step(self, step):
         action = step.get("action")
         
         print(f"  → {action}", end="")
-        if "selector" in step:
+        if "mcp_id" in step:
+            print(f" (mcp_id={step['mcp_id']})", end="")
+        elif "selector" in step:
             print(f" ({step['selector']})", end="")
         if "text" in step:
             print(f" with '{step['text']}'", end="")
@@ -55,17 +109,34 @@ class AIOrchestrator:
                 return success
             
             elif action == "fill":
-                success = await safe_fill(self.page, step["selector"], step["text"])
+                selector, timeout = await self.resolve_target(step)
+                if not selector:
+                    return False
+                self.last_target = selector
+                if self.recorder:
+                    # grab this before acting - a click can navigate the element away
+                    self.last_stable_selector = await stable_selector(self.page, selector)
+                success = await safe_fill(self.page, selector, step["text"], timeout=timeout)
                 return success
             
             elif action == "click":
-                success = await safe_click(self.page, step["selector"])
+                selector, timeout = await self.resolve_target(step)
+                if not selector:
+                    return False
+                self.last_target = selector
+                if self.recorder:
+                    # grab this before acting - a click can navigate the element away
+                    self.last_stable_selector = await stable_selector(self.page, selector)
+                success = await safe_click(self.page, selector, timeout=timeout)
                 return success
             
             elif action == "wait":
+                # the plan's seconds are treated as an upper bound - we stop once the page settles
                 seconds = step.get("seconds", 2)
-                await asyncio.sleep(seconds)
-                print(f"    [Success] waited {seconds} seconds")
+                start = asyncio.get_running_loop().time()
+                await wait_for_ready(self.page, load_state="load", dom_quiet_ms=300, timeout=seconds * 1000)
+                waited = asyncio.get_running_loop().time() - start
+                print(f"    [Success] waited {waited:.1f} of {seconds} seconds")
                 return True
             
             else:
@@ -76,7 +147,59 @@ class AIOrchestrator:
             print(f"[Failure] Error: {e}")
             return False
     
+    async def verify_step(self, step, url_before):
+        """
+        check that a step actually did what it was supposed to
+        
+        fills must leave the text in the field and gotos must land on the url. any step can also
+        carry an "expect" from the plan: url_change, url_contains or a selector that should appear
+        """
+        action = step.get("action")
+        timeout = config.VERIFY_TIMEOUT
+        
+        try:
+            if action == "fill":
+                value = await self.page.input_value(self.last_target, timeout=timeout)
+                if value != step["text"]:
+                    print(f"    [Failure] field has '{value}' instead of '{step['text']}'")
+                    return False
+            elif action == "goto":
+                # redirects (http -> https, adding www.) are fine, landing on another site isn't
+                wanted = (urlparse(step["url"]).hostname or "").removeprefix("www.")
+                landed = (urlparse(self.page.url).hostname or "").removeprefix("www.")
+                if wanted != landed:
+                    print(f"    [Failure] ended up at {self.page.url}")
+                    return False
+        except Exception as e:
+            print(f"    [Failure] could not verify {action}: {e}")
+            return False
+        
+        expect = step.get("expect") or {}
+        if expect.get("url_change") and self.page.url == url_before:
+            if not await wait_for_url_change(self.page, url_before, timeout):
+                return False
+        if expect.get("url_contains"):
+            try:
+                await self.page.wait_for_url(
+                    lambda url: expect["url_contains"] in url, wait_until="commit", timeout=timeout
+                )
+            except Exception:
+                print(f"    [Failure] url doesn't contain {expect['url_contains']}")
+                return False
+        if expect.get("selector"):
+            if not await wait_for_element(self.page, expect["selector"], timeout=timeout):
+                return False
+        return True
+    
     async def execute_goal(self, goal, start_url=None):
+        """execute a goal using AI (see _execute_goal), wrapped in a tracing span"""
+        with span("execute_goal", goal=goal) as s:
+            result = await self._execute_goal(goal, start_url)
+            s.set(outcome="ok" if result["success"] else "failure",
+                  llm_calls=result.get("llm_calls", 0), replayed=result.get("replayed", False))
+            return result
+    
+    async def _execute_goal(self, goal, start_url=None):
         """
         execute a goal using AI
         
@@ -96,43 +219,185 @@ class AIOrchestrator:
         if start_url:
             print(f"Starting at: {start_url}")
             await safe_goto(self.page, start_url)
-            await asyncio.sleep(2)
+            await wait_for_ready(self.page, dom_quiet_ms=300, timeout=2000)
+        
+        self.time_to_first_action = None
+        
+        # if we've solved a goal like this before, replay the recorded script instead of asking the AI
+        completed = []
+        trace = []
+        progress = None
+        script, script_steps = self.recorder.match(goal, self.page.url) if self.recorder else (None, None)
+        if script:
+            print(f"[Replay] Goal matches recorded script '{script['template']}'")
+            failed_step = await self.replay_steps(script_steps, completed, trace)
+            self.recorder.report(script, failed_step is None)
+            if failed_step is None:
+                print("\n" + "="*60)
+                print("EXECUTION COMPLETE (replayed, no LLM)")
+                print("="*60)
+                return self._goal_result(True, completed, 0, 0, replayed=True)
+            
+            # carry on with live planning from wherever the script got to
+            print("[Replay] Script didn't fit the page, falling back to the AI")
+            if completed:
+                progress = {"done": completed, "failed": failed_step}
         
         # step 1: get page context using MCP
         print("\n[Step 1] Getting page context (MCP)...")
-        page_context = await get_page_context(self.page)
+        page_context = await self.context_tracker.get_context()
         print(f"Found {len(page_context['interactive_elements'])} interactive elements")
         
-        # step 2: ask AI for a plan
+        # step 2: ask AI for a plan (streamed, so the first action can start before it's all written)
         print("\n[Step 2] Asking AI for a plan...")
-        plan = self.llm_client.generate_plan(goal, page_context)
+        loop = asyncio.get_running_loop()
+        plan_requested = loop.time()
+        steps = self.plan_steps(goal, page_context, progress)
         
-        if not plan:
-            print("\n[Error] AI could not generate a plan")
-            return {"success": False, "error": "No plan generated"}
-        
-        print(f"  AI generated {len(plan)} steps")
-        
-        # step 3: execute the plan
+        # step 3: execute the plan, checking every step and replanning only when one fails
         print("\n[Step 3] Executing AI's plan...")
-        for i, step in enumerate(plan, 1):
-            print(f"\nStep {i}/{len(plan)}:")
-            success = await self.execute_step(step)
+        llm_calls = 1
+        replans = 0
+        
+        while True:
+            failed_step = None
+            planned = 0
+            try:
+                async for step in steps:
+                    planned += 1
+                    if self.time_to_first_action is None:
+                        self.time_to_first_action = loop.time() - plan_requested
+                        print(f"  [Timing] first action after {self.time_to_first_action:.2f}s")
+                    
+                    print(f"\nStep {len(completed) + 1}:")
+                    url_before = self.page.url
+                    success = await self.execute_step(step)
+                    
+                    if success:
+                        # let whatever the step kicked off (navigation, dropdowns...) settle before checking it
+                        await wait_for_ready(self.page, load_state="domcontentloaded", dom_quiet_ms=200, timeout=1000)
+                        success = await self.verify_step(step, url_before)
+                    
+                    if not success:
+                        failed_step = step
+                        break
+                    completed.append(step)
+                    trace.append(self._trace_entry(step))
+            finally:
+                # stops the rest of the stream if we bailed out part way through
+                await steps.aclose()
             
-            if not success:
-                print(f"\n[Warning] Step {i} failed, but continuing...")
+            if planned == 0:
+                print("\n[Error] AI could not generate a plan")
+                return self._goal_result(False, completed, llm_calls, replans, "No plan generated")
+            if failed_step is None:
+                break
+            
+            print(f"\n[Warning] Step {len(completed) + 1} failed")
+            # don't let a broken plan get replayed from the cache next time
+            if replans == 0 and not progress:
+                await self.llm_client.invalidate_plan_async(goal, page_context)
+            
+            if replans >= config.MAX_REPLANS or llm_calls >= config.MAX_LLM_CALLS:
+                print("[Error] Out of replans, giving up")
+                return self._goal_result(False, completed, llm_calls, replans, "Step failed and out of replans")
             
-            await asyncio.sleep(1)
+            # look at the page as it is now and ask for just the rest of the goal
+            replans += 1
+            print(f"\n[Replan {replans}] Asking AI how to finish the goal...")
+            current_context = await self.context_tracker.get_context()
+            steps = self.plan_steps(goal, current_context, progress={"done": completed, "failed": failed_step})
+            llm_calls += 1
         
         print("\n" + "="*60)
         print("EXECUTION COMPLETE")
         print("="*60)
         
-        return {
-            "success": True,
-            "steps_executed": len(plan),
+        if self.recorder:
+            self.recorder.record(goal, start_url or page_context["url"], trace)
+        
+        return self._goal_result(True, completed, llm_calls, replans)
+    
+    async def replay_steps(self, steps, completed, trace):
+        """
+        run recorded steps, checking each one's element is there first
+        
+        fills in completed/trace as it goes, returns the step that failed or None if all worked
+        """
+        for step in steps:
+            print(f"\nReplay step {len(completed) + 1}/{len(steps)}:")
+            
+            # precondition: the element we recorded has to be on the page
+            if step.get("selector"):
+                if not await wait_for_element(self.page, step["selector"], timeout=config.REPLAY_PRECHECK_TIMEOUT):
+                    return step
+            
+            url_before = self.page.url
+            if not await self.execute_step(step):
+                return step
+            await wait_for_ready(self.page, load_state="domcontentloaded", dom_quiet_ms=200, timeout=1000)
+            if not await self.verify_step(step, url_before):
+                return step
+            
+            completed.append(step)
+            trace.append(step)
+        return None
+    
+    def _trace_entry(self, step):
+        """the step as we'd want to replay it - with a selector that outlives this page"""
+        entry = {key: value for key, value in step.items() if key not in ("mcp_id", "selector")}
+        if step.get("action") in ("fill", "click"):
+            entry["selector"] = self.last_stable_selector
+        return entry
+    
+    async def plan_steps(self, goal, page_context, progress=None, stream=None):
+        """
+        async iterator over the plan's steps
+        
+        streaming (config.STREAM_PLANS): steps come out as soon as Claude writes them, and the
+        stream keeps being read in the background while we run the current step.
+        batch: waits for the whole plan, then hands the steps out one by one
+        """
+        stream = config.STREAM_PLANS if stream is None else stream
+        if not stream:
+            for step in await self.llm_client.generate_plan_async(goal, page_context, progress):
+                yield step
+            return
+        
+        queue = asyncio.Queue()
+        done = object()
+        
+        async def read_stream():
+            try:
+                async for step in self.llm_client.stream_plan(goal, page_context, progress):
+                    queue.put_nowait(step)
+            finally:
+                queue.put_nowait(done)
+        
+        reader = asyncio.create_task(read_stream())
+        try:
+            while (step := await queue.get()) is not done:
+                yield step
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+    
+    def _goal_result(self, success, completed, llm_calls, replans, error=None, replayed=False):
+        result = {
+            "success": success,
+            "replayed": replayed,
+            "steps_executed": len(completed),
+            "llm_calls": llm_calls,
+            "replans": replans,
+            "time_to_first_action": self.time_to_first_action,
             "final_url": self.page.url
         }
+        if error:
+            result["error"] = error
+        return result
 
 
 async def demo():
@@ -145,7 +410,7 @@ async def demo():
         # example
         result = await orchestrator.execute_goal(
             goal="Search for a dinosaur on Amazon",
-            start_url="https://www.amazon.com"
+            start_url=config.AMAZON_URL
         )
         
         await asyncio.sleep(5)
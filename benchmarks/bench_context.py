@@ -0,0 +1,87 @@
+# microbenchmark: page context extraction on big pages
+# compares the original three-pass scan with the single-pass TreeWalker and the accessibility backend
+#
+# run with: python3 benchmarks/bench_context.py
+# any saved pages dropped into benchmarks/pages/*.html get benchmarked too
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from playwright.async_api import async_playwright
+from mcp_context import SCAN_JS, get_accessibility_elements
+from fixtures import large_page_html
+import config
+
+ROUNDS = 10
+PAGES_DIR = Path(__file__).parent / "pages"
+
+# the original get_page_context scan - one querySelectorAll per tag, offsetParent + innerText
+# on every match, and everything collected before slice() throws most of it away
+OLD_SCAN_JS = """
+    (maxElements) => {
+        const interactive = [];
+        ['button', 'input', 'a'].forEach(selector => {
+            document.querySelectorAll(selector).forEach(el => {
+                if (el.offsetParent !== null) {
+                    interactive.push({
+                        tag: el.tagName.toLowerCase(),
+                        type: el.type || '',
+                        text: el.innerText?.substring(0, 100) || '',
+                        placeholder: el.placeholder || '',
+                        id: el.id || '',
+                        name: el.name || '',
+                        href: el.href || ''
+                    });
+                }
+            });
+        });
+        return interactive.slice(0, maxElements);
+    }
+"""
+
+
+async def time_scan(page, scan):
+    times = []
+    for _ in range(ROUNDS):
+        # touch the DOM so every round starts with dirty style/layout like a live page would
+        await page.evaluate("document.body.dataset.round = Math.random()")
+        start = time.perf_counter()
+        elements = await scan()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], len(elements)
+
+
+async def bench_page(page, name):
+    scans = {
+        "old 3-pass": lambda: page.evaluate(OLD_SCAN_JS, config.MCP_MAX_ELEMENTS),
+        "treewalker": lambda: page.evaluate(SCAN_JS, config.MCP_MAX_ELEMENTS),
+        "accessibility": lambda: get_accessibility_elements(page),
+    }
+    print(f"\n{name}")
+    for label, scan in scans.items():
+        median_ms, count = await time_scan(page, scan)
+        print(f"  {label:<14} {median_ms:8.2f} ms  ({count} elements)")
+
+
+async def main():
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+
+        for links in (1000, 5000, 20000):
+            await page.set_content(large_page_html(links=links))
+            await bench_page(page, f"synthetic page, {links} links")
+
+        for saved in sorted(PAGES_DIR.glob("*.html")):
+            await page.set_content(saved.read_text(errors="ignore"))
+            await bench_page(page, f"saved page {saved.name}")
+
+        await browser.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
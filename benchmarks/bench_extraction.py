@@ -0,0 +1,54 @@
+# benchmark: bulk search result extraction vs the old one-selector-at-a-time approach
+# run with: python3 benchmarks/bench_extraction.py
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from playwright.async_api import async_playwright
+from search_results import RESULT_SELECTOR, extract_search_results
+from fixtures import search_results_html
+
+ROUNDS = 20
+
+
+async def per_element_extract(page):
+    """the old way - a text_content round trip for every field of every card"""
+    records = []
+    for card in await page.query_selector_all(RESULT_SELECTOR):
+        title = await card.query_selector("h2")
+        price = await card.query_selector(".a-price-whole")
+        records.append({
+            "title": (await title.text_content()).strip() if title else "",
+            "price_whole": (await price.text_content()).strip() if price else "",
+        })
+    return records
+
+
+async def time_it(func, page):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        records = await func(page)
+    return (time.perf_counter() - start) / ROUNDS * 1000, len(records)
+
+
+async def main():
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+
+        print(f"{'cards':>6} {'per-element ms':>15} {'bulk ms':>10} {'speedup':>8}")
+        for cards in (20, 60, 200):
+            await page.set_content(search_results_html(cards))
+            slow_ms, slow_count = await time_it(per_element_extract, page)
+            fast_ms, fast_count = await time_it(extract_search_results, page)
+            assert slow_count == fast_count == cards
+            print(f"{cards:>6} {slow_ms:>15.1f} {fast_ms:>10.1f} {slow_ms / fast_ms:>7.1f}x")
+
+        await browser.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
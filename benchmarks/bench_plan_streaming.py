@@ -0,0 +1,62 @@
+# benchmark: time to first action, streamed plan vs waiting for the whole plan
+# runs against the fake LLM server, so no API key or browser needed
+#
+# run with: python3 benchmarks/bench_plan_streaming.py
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from llm_client import LLMClient
+from fake_llm import FakeLLMServer
+import config
+
+ROUNDS = 5
+
+# a longer plan makes the difference easier to see
+PLAN = [{"action": "click", "selector": f"#step-{i}", "expect": {"selector": f"#after-{i}"}} for i in range(8)]
+
+CONTEXT = {
+    "title": "Amazon.com",
+    "url": "https://www.amazon.com",
+    "interactive_elements": [{"tag": "input", "id": "twotabsearchtextbox", "text": "", "placeholder": "Search"}],
+}
+
+
+async def batch_first_action(client):
+    start = time.perf_counter()
+    plan = await client.generate_plan_async("search for dinosaurs", CONTEXT)
+    first = time.perf_counter() - start
+    return first, time.perf_counter() - start, len(plan)
+
+
+async def stream_first_action(client):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    async for _ in client.stream_plan("search for dinosaurs", CONTEXT):
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return first, time.perf_counter() - start, count
+
+
+async def main():
+    config.PLAN_CACHE_ENABLED = False  # every round has to hit the "LLM"
+    with FakeLLMServer(PLAN, first_token_delay=0.3, token_delay=0.01) as server:
+        client = LLMClient(api_key="fake", base_url=server.url)
+        try:
+            print(f"{'mode':<8} {'first action':>13} {'full plan':>10} {'steps':>6}")
+            for label, run in (("batch", batch_first_action), ("stream", stream_first_action)):
+                results = [await run(client) for _ in range(ROUNDS)]
+                first = sorted(r[0] for r in results)[ROUNDS // 2]
+                full = sorted(r[1] for r in results)[ROUNDS // 2]
+                print(f"{label:<8} {first * 1000:>10.0f} ms {full * 1000:>7.0f} ms {results[0][2]:>6}")
+        finally:
+            await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
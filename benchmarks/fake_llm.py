@@ -0,0 +1,125 @@
+# a stand-in for the anthropic messages API that returns canned plans
+# supports both normal and streamed (server-sent events) responses, with made-up latency
+#
+# usage:
+#     with FakeLLMServer(plan) as server:
+#         client = LLMClient(api_key="fake", base_url=server.url)
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PLAN = [
+    {"action": "fill", "selector": "#twotabsearchtextbox", "text": "dinosaur"},
+    {"action": "click", "selector": "#nav-search-submit-button", "expect": {"url_contains": "/s"}},
+]
+
+
+class FakeLLMServer:
+    """
+    args passed in:
+        plan: the plan to answer with, or a function (request body dict) -> plan
+        first_token_delay: seconds before the first token (time the model spends "thinking")
+        token_delay: seconds between each ~4 character token
+    """
+
+    def __init__(self, plan=None, first_token_delay=0.3, token_delay=0.01, port=0):
+        self.plan = plan or DEFAULT_PLAN
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def response_text(self, body):
+        plan = self.plan(body) if callable(self.plan) else self.plan
+        return "```json\n" + json.dumps(plan, indent=2) + "\n```"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                fake.requests += 1
+                body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+                text = fake.response_text(body)
+                tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+
+                if body.get("stream"):
+                    self._stream(tokens)
+                else:
+                    # a normal response only comes back once every token is "generated"
+                    time.sleep(fake.first_token_delay + fake.token_delay * len(tokens))
+                    self._json({
+                        "id": "msg_fake",
+                        "type": "message",
+                        "role": "assistant",
+                        "model": body.get("model", "fake"),
+                        "content": [{"type": "text", "text": text}],
+                        "stop_reason": "end_turn",
+                        "stop_sequence": None,
+                        "usage": {"input_tokens": 100, "output_tokens": len(tokens)},
+                    })
+
+            def _stream(self, tokens):
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.end_headers()
+
+                self._event("message_start", {"type": "message_start", "message": {
+                    "id": "msg_fake", "type": "message", "role": "assistant", "content": [],
+                    "model": "fake", "stop_reason": None, "stop_sequence": None,
+                    "usage": {"input_tokens": 100, "output_tokens": 1},
+                }})
+                self._event("content_block_start", {
+                    "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+                })
+                time.sleep(fake.first_token_delay)
+                for token in tokens:
+                    self._event("content_block_delta", {
+                        "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token},
+                    })
+                    time.sleep(fake.token_delay)
+                self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+                self._event("message_delta", {
+                    "type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                    "usage": {"output_tokens": len(tokens)},
+                })
+                self._event("message_stop", {"type": "message_stop"})
+
+            def _event(self, name, data):
+                self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+                self.wfile.flush()
+
+            def _json(self, data):
+                raw = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,94 @@
+# local amazon-like site for benchmarks - serves a home page and search result pages
+#
+#   /              home page with the search box
+#   /s?k=dinosaur  results page (cards per page and number of pages are configurable)
+#
+# if benchmarks/pages/home.html or benchmarks/pages/search.html exist (saved copies of the
+# real pages), those get served instead of the generated ones
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from fixtures import home_page_html, search_results_html
+
+PAGES_DIR = Path(__file__).parent / "pages"
+
+
+class FixtureServer:
+    """
+    args passed in:
+        cards: result cards per search page (scales to thousands)
+        pages: how many result pages a search has
+        latency: seconds of made-up server time per request
+    """
+
+    def __init__(self, cards=60, pages=3, latency=0.0, port=0):
+        self.cards = cards
+        self.pages = pages
+        self.latency = latency
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def render(self, path, params):
+        if path == "/s":
+            saved = PAGES_DIR / "search.html"
+            if saved.exists():
+                return saved.read_bytes()
+            query = params.get("k", ["dinosaur"])[0]
+            page = int(params.get("page", ["1"])[0])
+            next_url = f"/s?{urlencode({'k': query, 'page': page + 1})}" if page < self.pages else None
+            return search_results_html(self.cards, query=query, page=page, next_url=next_url).encode()
+
+        saved = PAGES_DIR / "home.html"
+        if saved.exists():
+            return saved.read_bytes()
+        return home_page_html().encode()
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fixture.requests += 1
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+
+                url = urlparse(self.path)
+                if url.path not in ("/", "/s"):
+                    self.send_error(404)
+                    return
+
+                body = fixture.render(url.path, parse_qs(url.query))
+                self.send_response(200)
+                self.send_header("content-type", "text/html; charset=utf-8")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
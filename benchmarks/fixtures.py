@@ -0,0 +1,74 @@
+# fake amazon pages for the benchmarks - same markup bits our selectors look for
+
+import random
+
+
+def result_card(position, rng):
+    """one search result card"""
+    asin = f"B0{rng.randrange(10**8):08d}"
+    whole = rng.randrange(5, 500)
+    fraction = rng.randrange(100)
+    rating = round(rng.uniform(2.5, 5.0), 1)
+    sponsored = position % 7 == 1
+    label = '<span class="puis-sponsored-label-text">Sponsored</span>' if sponsored else ""
+    return f"""
+    <div data-component-type="s-search-result" data-asin="{asin}" class="s-result-item">
+      {label}
+      <h2><a href="/dp/{asin}"><span>Dinosaur Toy Model {position} for Kids</span></a></h2>
+      <i class="a-icon a-icon-star-small"><span class="a-icon-alt">{rating} out of 5 stars</span></i>
+      <span class="a-price"><span class="a-price-whole">{whole}<span class="a-price-decimal">.</span></span><span class="a-price-fraction">{fraction:02d}</span></span>
+      <span class="a-price a-text-price"><span class="a-offscreen">${whole + 10}.00</span></span>
+    </div>"""
+
+
+NAV_HTML = """
+  <div id="nav-belt">
+    <form action="/s" method="get">
+      <input id="twotabsearchtextbox" name="k" placeholder="Search Amazon" value="{query}">
+      <input id="nav-search-submit-button" type="submit" value="Go">
+    </form>
+    <a href="/deals">Today's Deals</a> <a href="/registry">Registry</a> <a href="/gift-cards">Gift Cards</a>
+  </div>"""
+
+
+def home_page_html():
+    """the home page - just the search bar and some nav links"""
+    return f"""<!doctype html>
+<html><head><title>Amazon.com. Spend less. Smile more.</title></head>
+<body>{NAV_HTML.format(query="")}
+  <div id="gw-layout"><h1>Welcome</h1></div>
+</body></html>"""
+
+
+def search_results_html(cards=60, seed=0, query="dinosaur", page=1, next_url=None):
+    """a results page with `cards` result cards (and a next page link if next_url is given)"""
+    rng = random.Random(f"{seed}-{query}-{page}")
+    body = "".join(result_card(i, rng) for i in range(1, cards + 1))
+    pagination = f'<a class="s-pagination-next" href="{next_url}">Next</a>' if next_url else ""
+    return f"""<!doctype html>
+<html><head><title>Amazon.com : {query}</title></head>
+<body>{NAV_HTML.format(query=query)}
+  <div class="s-main-slot">{body}</div>
+  <div class="s-pagination-strip">{pagination}</div>
+</body></html>"""
+
+
+def large_page_html(links=5000, buttons=500, inputs=50, hidden_sections=20, seed=0):
+    """a big, messy page - lots of nav links, buttons, some hidden menus and scripts"""
+    rng = random.Random(seed)
+    parts = ['<div id="nav"><input id="twotabsearchtextbox" name="field-keywords" placeholder="Search Amazon">'
+             '<input id="nav-search-submit-button" type="submit" value="Go"></div>']
+    for i in range(links):
+        parts.append(f'<li><a href="/category/{rng.randrange(1000)}?ref=nav_{i}">Category link {i}</a></li>')
+        if i % 50 == 0:
+            parts.append(f'<script>window.__data{i} = {{"x": {i}}};</script>')
+    for i in range(buttons):
+        parts.append(f'<button class="btn" aria-label="Add item {i} to cart"><span>Add to cart</span></button>')
+    for i in range(inputs):
+        parts.append(f'<label>Field {i}<input name="field{i}" type="text"></label><div role="button">Toggle {i}</div>')
+    for i in range(hidden_sections):
+        hidden_links = "".join(f'<a href="/hidden/{i}/{j}">Hidden {j}</a>' for j in range(100))
+        parts.append(f'<div style="display:none">{hidden_links}</div>')
+    return f"""<!doctype html>
+<html><head><title>Big page</title></head>
+<body><ul>{"".join(parts)}</ul></body></html>"""
@@ -0,0 +1,234 @@
+# offline benchmark suite - runs our automation against the local fixture server and fake LLM
+# so results are repeatable and don't depend on amazon or the anthropic API
+#
+# run with:
+#     python3 benchmarks/run_benchmarks.py                        # every scenario
+#     python3 benchmarks/run_benchmarks.py --scenario batch_search --cards 2000
+#     python3 benchmarks/run_benchmarks.py --save v2              # save as a baseline
+#     python3 benchmarks/run_benchmarks.py --compare v2           # diff against a baseline
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "core_challenge"))
+
+import config
+
+# everything below talks to the local servers, never the real sites
+config.HEADLESS = True
+config.PLAN_CACHE_ENABLED = False   # every goal should really go to the (fake) LLM
+config.RECORD_PLANS = False
+config.SESSION_STATE = False        # every run starts from the same blank profile
+
+from browser_pool import BrowserPool
+from core_automation import BrowserAutomation
+from ai_orchestrator import AIOrchestrator
+from llm_client import LLMClient
+from mcp_context import ContextTracker, get_page_context
+from fake_llm import FakeLLMServer
+from fixture_server import FixtureServer
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+QUERIES = ["dinosaur", "t-rex toy", "stegosaurus", "lava lamp", "google home", "wireless mouse",
+           "usb c cable", "desk lamp", "water bottle", "phone stand"]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * pct), len(values) - 1)]
+
+
+def latency_stats(latencies, elapsed):
+    return {
+        "runs": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def memory_mb():
+    """peak RSS of this process, and current RSS of the browser processes we started (linux only)"""
+    python_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    browser_mb = 0.0
+    try:
+        children = {}
+        for pid in os.listdir("/proc"):
+            if pid.isdigit():
+                with open(f"/proc/{pid}/stat") as f:
+                    children.setdefault(int(f.read().rsplit(")", 1)[1].split()[1]), []).append(int(pid))
+        todo = list(children.get(os.getpid(), []))
+        while todo:
+            pid = todo.pop()
+            todo.extend(children.get(pid, []))
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        browser_mb += int(line.split()[1]) / 1024
+    except OSError:
+        return {"python_peak_mb": python_mb}
+    return {"python_peak_mb": python_mb, "browser_mb": browser_mb}
+
+
+async def single_search(pool, site, rounds):
+    """one search + extraction at a time"""
+    automation = BrowserAutomation(pool=pool)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(rounds):
+        run_start = time.perf_counter()
+        product = await automation.find_product(QUERIES[i % len(QUERIES)])
+        assert product, "single search failed"
+        latencies.append(time.perf_counter() - run_start)
+    return latency_stats(latencies, time.perf_counter() - start)
+
+
+async def batch_search(pool, site, rounds, concurrency=4):
+    """search_many over rounds queries"""
+    automation = BrowserAutomation(pool=pool)
+    queries = [QUERIES[i % len(QUERIES)] + f" {i}" for i in range(rounds)]
+    latencies = []
+    start = time.perf_counter()
+    async for result in automation.search_many(queries, concurrency=concurrency):
+        assert result["product"], f"batch search failed: {result['error']}"
+        latencies.append(result["latency"])
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    stats["concurrency"] = concurrency
+    return stats
+
+
+async def context_extraction(pool, site, rounds):
+    """full get_page_context vs the incremental tracker on a results page"""
+    async with pool.lease() as lease:
+        await lease.page.goto(f"{site}/s?k=dinosaur")
+        full, incremental = [], []
+        tracker = ContextTracker(lease.page)
+        await tracker.get_context()
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            run_start = time.perf_counter()
+            await get_page_context(lease.page)
+            full.append(time.perf_counter() - run_start)
+
+            run_start = time.perf_counter()
+            await tracker.get_context()
+            incremental.append(time.perf_counter() - run_start)
+        stats = latency_stats(full, time.perf_counter() - start)
+        stats["incremental_p50_ms"] = percentile(incremental, 0.5) * 1000
+        return stats
+
+
+async def execute_goal(pool, site, rounds, llm_url=None):
+    """whole AI flow - context, (fake) LLM plan, execution and verification"""
+    client = LLMClient(api_key="fake", base_url=llm_url)
+    orchestrator = AIOrchestrator(pool=pool, llm_client=client)
+    await orchestrator.setup()
+    latencies, first_action = [], []
+    start = time.perf_counter()
+    try:
+        for i in range(rounds):
+            run_start = time.perf_counter()
+            result = await orchestrator.execute_goal(f"Search for {QUERIES[i % len(QUERIES)]}", start_url=site)
+            assert result["success"], f"execute_goal failed: {result.get('error')}"
+            latencies.append(time.perf_counter() - run_start)
+            first_action.append(result["time_to_first_action"] or 0.0)
+    finally:
+        await orchestrator.cleanup()
+        await client.aclose()
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    stats["first_action_p50_ms"] = percentile(first_action, 0.5) * 1000
+    return stats
+
+
+SCENARIOS = {
+    "single_search": single_search,
+    "batch_search": batch_search,
+    "context_extraction": context_extraction,
+    "execute_goal": execute_goal,
+}
+
+
+def fake_plan(body):
+    """fill in whatever the goal asked to search for"""
+    prompt = body["messages"][0]["content"]
+    query = prompt.split("Goal: Search for ", 1)[-1].split("\n", 1)[0].strip()
+    return [
+        {"action": "fill", "selector": "#twotabsearchtextbox", "text": query},
+        {"action": "click", "selector": "#nav-search-submit-button", "expect": {"url_contains": "/s?k="}},
+    ]
+
+
+async def run(args):
+    results = {}
+    with FixtureServer(cards=args.cards, pages=args.pages) as site, \
+            FakeLLMServer(fake_plan, first_token_delay=args.llm_delay) as llm:
+        config.AMAZON_URL = site.url
+        config.SEARCH_ENGINE = args.engine
+        async with BrowserPool(size=args.browsers, contexts_per_browser=8) as pool:
+            for name in args.scenario or SCENARIOS:
+                print(f"\n[Bench] Running {name}...")
+                kwargs = {"llm_url": llm.url} if name == "execute_goal" else {}
+                results[name] = await SCENARIOS[name](pool, site.url, args.rounds, **kwargs)
+            results["pool"] = pool.stats()
+    results["memory"] = memory_mb()
+    results["settings"] = {"cards": args.cards, "rounds": args.rounds, "browsers": args.browsers, "engine": args.engine}
+    return results
+
+
+def print_results(results, baseline=None):
+    print("\n" + "="*72)
+    print("BENCHMARK RESULTS" + (" (vs baseline)" if baseline else ""))
+    print("="*72)
+    for name, stats in results.items():
+        if name in ("pool", "settings"):
+            continue
+        print(f"\n{name}")
+        for key, value in stats.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            line = f"  {key:<24} {value:>12.2f}"
+            old = (baseline or {}).get(name, {}).get(key)
+            if isinstance(old, (int, float)) and old:
+                line += f"   ({(value - old) / old * 100:+.1f}%)"
+            print(line)
+    print("="*72 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline benchmark suite")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="run only these")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=60, help="result cards per search page")
+    parser.add_argument("--pages", type=int, default=3, help="result pages per search")
+    parser.add_argument("--browsers", type=int, default=1)
+    parser.add_argument("--engine", choices=["browser", "auto", "http"], default="browser",
+                        help="search engine for the search scenarios (see config.SEARCH_ENGINE)")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="fake LLM thinking time (s)")
+    parser.add_argument("--save", metavar="NAME", help="save results as baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="diff against baselines/NAME.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+    print_results(results, baseline)
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        (BASELINE_DIR / f"{args.save}.json").write_text(json.dumps(results, indent=2))
+        print(f"[Bench] Saved baseline to {BASELINE_DIR / (args.save + '.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# keeps one chromium running in the background so short scripts can attach to it
+# instead of launching their own, which is most of their startup time
+#
+# run with:
+#     python3 browser_daemon.py start      # launch chromium and write the endpoint file
+#     python3 browser_daemon.py status
+#     python3 browser_daemon.py compare    # cold launch vs warm attach times
+#     python3 browser_daemon.py stop
+#
+# with BROWSER_DAEMON=1, BrowserPool looks for the endpoint file when it starts and connects
+# over CDP if the daemon answers, otherwise it launches chromium in-process like before.
+# the CDP port has no authentication, so it only listens on 127.0.0.1 and we only attach
+# after checking that whatever answers is the chromium we started (pid + websocket url)
+
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+import config
+
+
+def find_endpoint():
+    """the running daemon's websocket endpoint, or None if there isn't one we can trust"""
+    info = read_info()
+    if not info or not info.get("ws_endpoint") or not pid_alive(info.get("pid")):
+        return None
+    version = read_version(info["endpoint"])
+    if not version:
+        return None
+    # a different process can grab the port after ours dies - the browser id in the websocket
+    # url is new for every launch, so it only matches if this is still the chromium we started
+    if version.get("webSocketDebuggerUrl") != info["ws_endpoint"]:
+        print(f"[Daemon] Something else is answering on {info['endpoint']}, not attaching")
+        return None
+    return info["ws_endpoint"]
+
+
+def read_info():
+    try:
+        return json.loads(Path(config.BROWSER_DAEMON_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def read_version(endpoint, timeout=0.5):
+    """chromium's /json/version answer, or None if nothing (or nothing sensible) answers"""
+    try:
+        with urllib.request.urlopen(f"{endpoint}/json/version", timeout=timeout) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def is_alive(endpoint, timeout=0.5):
+    return read_version(endpoint, timeout) is not None
+
+
+def pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, just not ours to signal
+    return True
+
+
+def start(port=None, headless=None):
+    """launch chromium with remote debugging on and wait for it to answer"""
+    if find_endpoint():
+        print(f"[Daemon] Already running at {read_info()['endpoint']}")
+        return read_info()
+
+    port = port or config.BROWSER_DAEMON_PORT
+    headless = config.HEADLESS if headless is None else headless
+    endpoint = f"http://127.0.0.1:{port}"
+    if is_alive(endpoint):
+        raise RuntimeError(f"something else is already listening on {endpoint}")
+    profile = Path(config.BROWSER_DAEMON_FILE).parent / "daemon-profile"
+    profile.mkdir(parents=True, exist_ok=True)
+
+    # playwright only tells us where its chromium lives, we launch it ourselves so it outlives this process
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        executable = p.chromium.executable_path
+
+    args = [
+        executable,
+        f"--remote-debugging-port={port}",
+        "--remote-debugging-address=127.0.0.1",
+        f"--user-data-dir={profile}",
+        "--no-first-run",
+        "--no-default-browser-check",
+    ]
+    if headless:
+        args.append("--headless=new")
+    args.append("about:blank")
+
+    launch_start = time.perf_counter()
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + config.BROWSER_DAEMON_START_TIMEOUT
+    while not (version := read_version(endpoint)):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"chromium didn't start listening on {endpoint}")
+        time.sleep(0.05)
+
+    info = {"endpoint": endpoint, "ws_endpoint": version["webSocketDebuggerUrl"], "pid": process.pid, "started": time.time()}
+    Path(config.BROWSER_DAEMON_FILE).write_text(json.dumps(info))
+    print(f"[Daemon] Chromium ready at {endpoint} (pid {process.pid}) in {(time.perf_counter() - launch_start) * 1000:.0f}ms")
+    return info
+
+
+def stop():
+    info = read_info()
+    if not info:
+        print("[Daemon] Not running")
+        return
+    # the pid may belong to something else by now, only signal it if it's still our chromium
+    if not find_endpoint():
+        print("[Daemon] Process was already gone")
+    else:
+        try:
+            os.kill(info["pid"], signal.SIGTERM)
+            print(f"[Daemon] Stopped pid {info['pid']}")
+        except ProcessLookupError:
+            print("[Daemon] Process was already gone")
+    Path(config.BROWSER_DAEMON_FILE).unlink(missing_ok=True)
+
+
+def status():
+    info = read_info()
+    if info and find_endpoint():
+        print(f"[Daemon] Running at {info['endpoint']} (pid {info['pid']}, up {time.time() - info['started']:.0f}s)")
+    else:
+        print("[Daemon] Not running")
+
+
+async def compare():
+    """time pool start + first page with an in-process launch, then attached to the daemon"""
+    from browser_pool import BrowserPool
+
+    use_daemon = config.BROWSER_DAEMON
+    timings = {}
+    try:
+        for name, attach in (("cold launch", False), ("warm attach", True)):
+            config.BROWSER_DAEMON = attach
+            start_time = time.perf_counter()
+            async with BrowserPool(size=1) as pool:
+                async with pool.lease() as lease:
+                    await lease.page.goto("about:blank")
+                timings[name] = time.perf_counter() - start_time
+                print(f"[Daemon] {name}: {timings[name] * 1000:.0f}ms ({pool.stats()['browser_source']})")
+    finally:
+        config.BROWSER_DAEMON = use_daemon
+    return timings
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "start":
+        start()
+    elif command == "stop":
+        stop()
+    elif command == "compare":
+        if not find_endpoint():
+            start()
+        asyncio.run(compare())
+    else:
+        status()
@@ -0,0 +1,305 @@
+# browser pool so we don't launch a whole chromium for every run
+# keeps a few warm browsers around and hands out isolated context + page "leases"
+
+import asyncio
+import time
+import browser_daemon
+from contextlib import asynccontextmanager
+from network_filter import NetworkFilter
+from network_archive import NetworkArchive
+from session_state import SessionStore
+import config
+
+
+class PageLease:
+    """a context + page checked out of the pool"""
+
+    def __init__(self, browser, context, page, slot=None, generation=0):
+        self.browser = browser  # None for persistent-profile contexts, which own their browser
+        self.context = context
+        self.page = page
+        self.slot = slot
+        self.generation = generation
+        self.navigations = 0
+        self._context_closed = False
+
+        # count main frame navigations so the pool knows when to recycle
+        page.on("framenavigated", self._on_navigated)
+        context.on("close", self._on_context_closed)
+
+    def is_connected(self):
+        if self.browser is None:
+            return not self._context_closed
+        return self.browser.is_connected()
+
+    def _on_navigated(self, frame):
+        if frame == self.page.main_frame:
+            self.navigations += 1
+
+    def _on_context_closed(self, context):
+        self._context_closed = True
+
+
+class BrowserPool:
+    """
+    keeps N warm browsers and hands out page leases
+
+    usage:
+        async with BrowserPool(size=2) as pool:
+            async with pool.lease() as lease:
+                await lease.page.goto("https://www.amazon.com")
+    """
+
+    def __init__(self, size=None, contexts_per_browser=None, max_navigations=None, headless=None,
+                 network_filter=None, archive=None, sessions=None):
+        self.size = size or config.POOL_SIZE
+        self.contexts_per_browser = contexts_per_browser or config.POOL_CONTEXTS_PER_BROWSER
+        self.max_navigations = max_navigations or config.POOL_MAX_NAVIGATIONS
+        self.headless = config.HEADLESS if headless is None else headless
+        # blocks images/fonts/trackers on every context (see config.BLOCK_RESOURCES)
+        self.network_filter = network_filter or NetworkFilter()
+        # live / record / replay of the traffic itself (see config.NETWORK_MODE)
+        self.archive = archive or NetworkArchive()
+        # saved cookies/storage (or whole profiles) per slot so contexts start warm
+        self.sessions = sessions or SessionStore()
+
+        self.playwright = None
+        self.endpoint = None  # CDP endpoint of the browser daemon, if we attached to one
+        self.browsers = []
+        self._active = {}  # browser -> number of leases currently out
+        self._idle = []    # warm leases waiting to be reused
+        self._leased = set()  # leases currently checked out, so close() can still write their HARs
+        self._free_slots = list(range(self.size * self.contexts_per_browser))  # session slots not in use
+        self._slots = asyncio.Semaphore(self.size * self.contexts_per_browser)
+        self._lock = asyncio.Lock()
+
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "recycled": 0,
+            "health_failures": 0,
+            "leases": 0,
+            "lease_wait_total": 0.0,
+            "lease_wait_max": 0.0,
+            "browser_source": None,   # "daemon" or "launched"
+            "startup_seconds": 0.0,   # playwright start + browsers ready
+        }
+
+    async def start(self):
+        """start playwright and launch the warm browsers"""
+        async with self._lock:
+            if self.playwright:
+                return self
+
+            self.archive.prepare()
+            start_time = time.perf_counter()
+            # imported here so scripts that never open a browser don't pay for it
+            from playwright.async_api import async_playwright
+            self.playwright = await async_playwright().start()
+            # persistent profiles launch their own browser per slot, on demand
+            if not self.sessions.persistent:
+                if config.BROWSER_DAEMON:
+                    self.endpoint = await asyncio.to_thread(browser_daemon.find_endpoint)
+                print(f"[Pool] Starting {self.size} browser(s)...")
+                for _ in range(self.size):
+                    await self._launch_browser()
+            self.metrics["startup_seconds"] = time.perf_counter() - start_time
+            how = "attached to daemon" if self.metrics["browser_source"] == "daemon" else "cold start"
+            print(f"[Pool] Browsers ready in {self.metrics['startup_seconds'] * 1000:.0f}ms ({how})")
+        return self
+
+    async def close(self):
+        """close every lease, browser and playwright itself (recorded HARs are written here)"""
+        # a context's HAR is only written when the context itself closes - closing the browser
+        # under it loses the recording, so checked-out leases get closed here too
+        for lease in self._idle + list(self._leased):
+            await self._close_lease(lease)
+        self._idle = []
+        self._leased = set()
+
+        # a browser we attached to over CDP only disconnects here, the daemon keeps running
+        for browser in self.browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self.browsers = []
+        self._active = {}
+
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+        print("[Pool] Closed")
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def acquire(self):
+        """check out a lease, waiting for a free slot if the pool is busy"""
+        await self.start()
+
+        wait_start = time.perf_counter()
+        await self._slots.acquire()
+        waited = time.perf_counter() - wait_start
+
+        self.metrics["leases"] += 1
+        self.metrics["lease_wait_total"] += waited
+        self.metrics["lease_wait_max"] = max(self.metrics["lease_wait_max"], waited)
+
+        try:
+            lease = await self._take_idle()
+            if lease:
+                self.metrics["hits"] += 1
+                self._active[lease.browser] = self._active.get(lease.browser, 0) + 1
+                self._leased.add(lease)
+                return lease
+
+            self.metrics["misses"] += 1
+            async with self._lock:
+                browser = await self._pick_browser()
+                self._active[browser] = self._active.get(browser, 0) + 1
+            try:
+                lease = await self._new_lease(browser)
+                self._leased.add(lease)
+                return lease
+            except Exception:
+                self._active[browser] = max(self._active.get(browser, 1) - 1, 0)
+                raise
+        except Exception:
+            self._slots.release()
+            raise
+
+    async def release(self, lease):
+        """give a lease back, recycling it if it is worn out or broken"""
+        try:
+            if lease not in self._leased:
+                return  # the pool was closed while it was out, close() already took care of it
+            self._leased.discard(lease)
+            self._active[lease.browser] = max(self._active.get(lease.browser, 1) - 1, 0)
+
+            if lease.navigations >= self.max_navigations:
+                self.metrics["recycled"] += 1
+                await self._close_lease(lease)
+            elif lease.page.is_closed() or not lease.is_connected():
+                self.metrics["health_failures"] += 1
+                await self._close_lease(lease, save=False)
+            elif lease.generation != self.sessions.generation(lease.slot):
+                # its session was invalidated while it was out
+                await self._close_lease(lease, save=False)
+            else:
+                await self.sessions.save(lease.context, lease.slot)
+                self._idle.append(lease)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def lease(self):
+        """async context manager version of acquire/release"""
+        lease = await self.acquire()
+        try:
+            yield lease
+        finally:
+            await self.release(lease)
+
+    def stats(self):
+        """pool hit/miss and lease wait numbers"""
+        stats = dict(self.metrics)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        stats["lease_wait_avg"] = stats["lease_wait_total"] / stats["leases"] if stats["leases"] else 0.0
+        stats["idle"] = len(self._idle)
+        stats["active"] = sum(self._active.values())
+        stats["network"] = self.network_filter.stats()
+        stats["archive"] = self.archive.stats()
+        stats["sessions"] = self.sessions.stats()
+        return stats
+
+    # internal helpers
+
+    async def _launch_browser(self):
+        browser = None
+        if self.endpoint:
+            try:
+                browser = await self.playwright.chromium.connect_over_cdp(self.endpoint)
+                self.metrics["browser_source"] = "daemon"
+            except Exception as e:
+                print(f"[Pool] Couldn't attach to browser daemon ({e}), launching instead")
+                self.endpoint = None
+        if browser is None:
+            browser = await self.playwright.chromium.launch(headless=self.headless)
+            self.metrics["browser_source"] = "launched"
+
+        self.browsers.append(browser)
+        self._active[browser] = 0
+        return browser
+
+    async def _pick_browser(self):
+        """least loaded connected browser, relaunching any that died"""
+        if self.sessions.persistent:
+            return None
+        for browser in list(self.browsers):
+            if not browser.is_connected():
+                self.browsers.remove(browser)
+                self._active.pop(browser, None)
+                await self._launch_browser()
+
+        return min(self.browsers, key=lambda b: self._active.get(b, 0))
+
+    async def _new_lease(self, browser):
+        slot = self._free_slots.pop(0)
+        try:
+            context = await self._new_context(browser, slot)
+            # persistent contexts come with a blank page already open
+            page = context.pages[0] if context.pages else await context.new_page()
+        except Exception:
+            self._free_slots.append(slot)
+            raise
+        return PageLease(browser, context, page, slot, self.sessions.generation(slot))
+
+    async def _new_context(self, browser, slot):
+        """every lease gets its own context so cookies/storage don't leak between them"""
+        options = self.archive.context_options()
+        if browser is None:
+            context = await self.playwright.chromium.launch_persistent_context(
+                self.sessions.profile_dir(slot), headless=self.headless, **options
+            )
+        else:
+            context = await browser.new_context(**options, **self.sessions.context_options(slot))
+        # the filter is installed last so it runs first - blocked requests never reach the archive
+        await self.archive.install(context)
+        await self.network_filter.install(context)
+        return context
+
+    async def _take_idle(self):
+        """pop a healthy warm lease, or None if there isn't one"""
+        while self._idle:
+            lease = self._idle.pop()
+            if lease.generation != self.sessions.generation(lease.slot):
+                await self._close_lease(lease, save=False)
+                continue
+            if await self._is_healthy(lease):
+                return lease
+            self.metrics["health_failures"] += 1
+            await self._close_lease(lease, save=False)
+        return None
+
+    async def _is_healthy(self, lease):
+        if not lease.is_connected() or lease.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(lease.page.evaluate("1"), timeout=2)
+            return True
+        except Exception:
+            return False
+
+    async def _close_lease(self, lease, save=True):
+        if save and lease.generation == self.sessions.generation(lease.slot):
+            await self.sessions.save(lease.context, lease.slot, force=True)
+        try:
+            await lease.context.close()
+        except Exception:
+            pass
+        self._free_slots.append(lease.slot)
@@ -5,4 +5,110 @@ load_dotenv()
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 HEADLESS = False  
-TIMEOUT = 30000   
\ No newline at end of file
+TIMEOUT = 30000   
+AMAZON_URL = os.getenv("AMAZON_URL", "https://www.amazon.com")  # point at the benchmark fixture server to run offline
+
+# browser pool settings
+POOL_SIZE = 1                  # how many warm browsers to keep around
+POOL_CONTEXTS_PER_BROWSER = 4  # how many leases one browser can hand out at once
+POOL_MAX_NAVIGATIONS = 50      # recycle a context after this many navigations
+
+# network filtering - we only read text, so skip the heavy stuff
+BLOCK_RESOURCES = True
+BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+BLOCKED_DOMAINS = [
+    "amazon-adsystem.com",
+    "doubleclick.net",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "facebook.net",
+    "scorecardresearch.com",
+]
+BLOCKED_URL_PATTERNS = [r"/uedata", r"/csm/", r"\.(mp4|webm|gif)(\?|$)"]  # regexes
+
+# on-disk search result cache
+RESULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results.db")
+RESULT_CACHE_TTL = 6 * 60 * 60          # seconds a cached result counts as fresh
+RESULT_CACHE_STALE_SECONDS = 24 * 60 * 60  # how long past the TTL we'll still serve it while refreshing
+RESULT_CACHE_MAX_ENTRIES = 10000
+
+# plan cache - lets repeat goals on the same page layout skip the LLM
+PLAN_CACHE_ENABLED = True
+PLAN_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "plans.db")
+PLAN_CACHE_TTL = 7 * 24 * 60 * 60   # seconds
+PLAN_CACHE_MEMORY_ENTRIES = 256
+PLAN_CACHE_MAX_ENTRIES = 5000
+
+# LLM client settings
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL") or None  # point at a local stand-in server for tests
+LLM_TIMEOUT = 60.0          # seconds per request
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 0.5      # seconds, doubled every retry (with jitter)
+LLM_BACKOFF_MAX = 8.0
+LLM_MAX_CONCURRENCY = 4     # requests in flight at once from one client
+LLM_MAX_CONNECTIONS = 10    # pooled keep-alive connections
+
+# page context settings
+MCP_MAX_ELEMENTS = 150      # elements collected from the page
+PROMPT_TOKEN_BUDGET = 600   # tokens of element descriptions allowed in the prompt
+MCP_BACKEND = "dom"         # get_page_context(): "dom" (single pass DOM walk) or "accessibility" (chromium's accessibility tree) - ContextTracker always walks the DOM
+
+# closed-loop execution
+VERIFY_TIMEOUT = 3000   # ms to wait for a step's expected result
+MAX_REPLANS = 2         # partial replans allowed per goal after a step fails
+MAX_LLM_CALLS = 3       # total LLM calls allowed per goal (first plan included)
+STREAM_PLANS = True     # start running actions while the plan is still being written
+
+# plan record/replay - successful AI runs get saved as scripts that later goals can replay
+RECORD_PLANS = True
+SCRIPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "scripts.json")
+REPLAY_PRECHECK_TIMEOUT = 3000  # ms to wait for a recorded element before giving up on the script
+REPLAY_MAX_FAILURES = 3         # drop a script once it has failed this many times
+
+# network mode - "live", "record" (save traffic to HAR) or "replay" (serve every request from the HARs)
+NETWORK_MODE = os.getenv("NETWORK_MODE", "live")
+HAR_SCENARIO = os.getenv("HAR_SCENARIO", "default")  # each scenario gets its own folder of HARs
+HAR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "har")
+HAR_NOT_FOUND = os.getenv("HAR_NOT_FOUND", "abort")  # replay misses: "abort" or "fallback" (go to the network)
+
+# saved browser sessions - pooled contexts start with the last run's cookies/storage instead of a blank profile.
+# off by default: leases start clean and nothing is written to disk unless you ask for it
+SESSION_STATE = os.getenv("SESSION_STATE", "") == "1"
+SESSION_PERSISTENT = os.getenv("SESSION_PERSISTENT", "") == "1"  # full user-data dir (disk cache too) per pool slot
+SESSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sessions")
+SESSION_TTL = 24 * 60 * 60      # seconds before a session is thrown away and started fresh
+SESSION_SAVE_INTERVAL = 60      # seconds between storage state saves for a slot (always saved on close)
+
+# browser daemon - a background chromium (python3 browser_daemon.py start) that pools attach to over CDP
+BROWSER_DAEMON = os.getenv("BROWSER_DAEMON", "") == "1"    # opt-in: attach when the daemon is running
+BROWSER_DAEMON_PORT = int(os.getenv("BROWSER_DAEMON_PORT", "9222"))
+BROWSER_DAEMON_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "browser.json")
+BROWSER_DAEMON_START_TIMEOUT = 15   # seconds to wait for chromium to start listening
+
+# sharded batch runner (core_challenge/batch_runner.py)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0"))   # worker processes, 0 = one per CPU core
+BATCH_WORKER_CONCURRENCY = 4    # searches in flight inside each worker
+BATCH_MAX_ATTEMPTS = 2          # times a query is retried after its worker crashed
+
+# search engine for find_product / search_many - "browser" by default. "auto" tries plain HTTP
+# first and falls back to the browser on blocks or pages it can't parse, "http" uses only HTTP
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "browser")
+HTTP_TIMEOUT = 10.0             # seconds per request
+HTTP_MAX_CONNECTIONS = 20       # pooled keep-alive connections (HTTP/2 if the h2 package is installed)
+HTTP_MAX_BLOCKS = 3             # blocks in a row before the fast path backs off...
+HTTP_BLOCK_COOLDOWN = 300       # ...for this many seconds
+
+# adaptive timeouts - each wait's timeout is learned from recent latencies for the same
+# action/domain/selector: p99 * multiplier + margin, between the floor and the fixed ceilings
+ELEMENT_TIMEOUT = 10000     # ms, ceiling for element/load waits (TIMEOUT is the ceiling for navigation)
+ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "1") == "1"
+TIMEOUT_PERCENTILE = 0.99
+TIMEOUT_MULTIPLIER = 1.5
+TIMEOUT_MARGIN_MS = 500
+TIMEOUT_FLOOR_MS = 1000
+TIMEOUT_WINDOW = 200        # latencies kept per key
+TIMEOUT_MIN_SAMPLES = 20    # below this we use the next less specific key, then the ceiling
+TIMEOUT_MAX_KEYS = 2000
+
+# tracing - timing spans around navigation, waits, context extraction, LLM calls and plan steps
+TRACING = os.getenv("TRACING", "") == "1"
@@ -0,0 +1,241 @@
+# sharded batch runner - spreads a query list over several worker processes
+#
+# one process with one event loop tops out on a single core (page JS, result parsing and
+# playwright's driver chatter all share it), so each worker process runs its own
+# BrowserAutomation + pool and the parent just hands out queries and collects results.
+#
+# run with:
+#     python3 batch_runner.py queries.txt --workers 4 --concurrency 4 > results.jsonl
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import deque
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from network_archive import NetworkArchive
+import config
+
+
+class ShardedBatchRunner:
+    """
+    runs search_record() for every query across `workers` processes
+
+    work stealing: workers ask for a query every time one of their `concurrency` slots frees
+    up, so a worker stuck on slow queries simply takes fewer of them.
+    crash isolation: if a worker process dies, a replacement takes over its shard and its
+    in-flight queries are retried one at a time on an otherwise idle worker, so the query that
+    actually crashes it can't keep taking the others down too (up to max_attempts per query).
+
+    usage:
+        runner = ShardedBatchRunner(workers=4)
+        for record in runner.run(queries):   # in input order
+            ...
+        runner.print_summary()
+    """
+
+    def __init__(self, workers=None, concurrency=None, max_attempts=None, automation_factory=None):
+        self.workers = workers or config.BATCH_WORKERS or os.cpu_count() or 1
+        self.concurrency = concurrency or config.BATCH_WORKER_CONCURRENCY
+        self.max_attempts = max_attempts or config.BATCH_MAX_ATTEMPTS
+        # called in each worker to build its automation, has to be a top level (picklable) callable
+        self.automation_factory = automation_factory
+        self.stats = {}
+
+    def run(self, queries):
+        """yields one record per query, in input order, as soon as every earlier one is done"""
+        ctx = multiprocessing.get_context("spawn")  # fork doesn't mix with playwright's threads
+        # the HAR scenario is shared by every worker, so it's wiped (record) or checked (replay)
+        # once here - a worker that wiped it on start, or on respawn, would delete the others' HARs
+        NetworkArchive().prepare()
+        outbox = ctx.Queue()
+        pending = deque(enumerate(queries))
+        retries = deque()  # queries that were in flight when their worker died
+        total = len(pending)
+        attempts = {}
+        done = {}        # index -> record, waiting for earlier indexes before it can be yielded
+        next_index = 0
+        shards = {}      # shard id -> its current worker process {"id", "process", "inbox", "credits", "in_flight"}
+        worker_ids = itertools.count()
+        startup_failures = 0
+        worker_stats = {}
+        batch_start = time.perf_counter()
+
+        def spawn(shard):
+            inbox = ctx.Queue()
+            worker_id = next(worker_ids)
+            process = ctx.Process(
+                target=_worker_main,
+                args=(shard, worker_id, inbox, outbox, self.concurrency, self.automation_factory),
+                daemon=True,
+            )
+            process.start()
+            shards[shard] = {"id": worker_id, "process": process, "inbox": inbox, "credits": 0,
+                             "in_flight": {}, "ready": False, "solo": False}
+            worker_stats.setdefault(shard, {"completed": 0, "succeeded": 0, "crashes": 0, "started": time.perf_counter()})
+
+        def send(worker, item):
+            index, query = item
+            attempts[index] = attempts.get(index, 0) + 1
+            worker["in_flight"][index] = query
+            worker["credits"] -= 1
+            worker["inbox"].put(item)
+
+        def dispatch():
+            ready = [w for w in shards.values() if w["ready"]]
+            # one worker drains so it can take a retry on its own
+            draining = min(ready, key=lambda w: len(w["in_flight"])) if retries and ready else None
+            for worker in ready:
+                if worker is draining and not worker["in_flight"]:
+                    send(worker, retries.popleft())
+                    worker["solo"] = True
+                if worker is draining or worker["solo"]:
+                    continue
+                while worker["credits"] and pending:
+                    send(worker, pending.popleft())
+
+        def finish(record):
+            if record["index"] not in done and record["index"] >= next_index:
+                done[record["index"]] = record
+
+        for shard in range(min(self.workers, total)):
+            spawn(shard)
+        print(f"[Batch] {total} queries across {len(shards)} worker process(es) x {self.concurrency}", file=sys.stderr)
+
+        try:
+            while next_index < total:
+                try:
+                    kind, shard, worker_id, payload = outbox.get(timeout=0.5)
+                except queue.Empty:
+                    kind = None
+
+                # messages from a worker that was already replaced only count as results
+                worker = shards[shard] if kind and shards[shard]["id"] == worker_id else None
+                if kind == "ready" and worker:
+                    worker["ready"] = True
+                    worker["credits"] += payload
+                elif kind == "result":
+                    if worker:
+                        worker["in_flight"].pop(payload["index"], None)
+                        worker["credits"] += 1
+                        worker["solo"] = bool(worker["in_flight"]) and worker["solo"]
+                    payload["worker"] = shard
+                    worker_stats[shard]["completed"] += 1
+                    worker_stats[shard]["succeeded"] += payload["error"] is None
+                    finish(payload)
+
+                # a dead worker's queries go back on the queue for the others
+                for shard, worker in list(shards.items()):
+                    if worker["process"].is_alive():
+                        continue
+                    print(f"[Batch] Worker {shard} died (exit code {worker['process'].exitcode}), "
+                          f"re-queueing {len(worker['in_flight'])} queries", file=sys.stderr)
+                    worker_stats[shard]["crashes"] += 1
+                    if not worker["ready"]:
+                        startup_failures += 1
+                        if startup_failures >= self.workers * self.max_attempts:
+                            raise RuntimeError("batch workers keep dying before they start")
+                    for index, query in worker["in_flight"].items():
+                        if attempts[index] >= self.max_attempts:
+                            finish({"index": index, "query": query, "product": None, "latency": 0.0,
+                                    "error": f"worker crashed {attempts[index]} times", "worker": shard})
+                        else:
+                            retries.append((index, query))
+                    spawn(shard)
+
+                dispatch()
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in shards.values():
+                worker["inbox"].put(None)
+            for worker in shards.values():
+                worker["process"].join(timeout=10)
+                if worker["process"].is_alive():
+                    worker["process"].terminate()
+
+            elapsed = time.perf_counter() - batch_start
+            for stats in worker_stats.values():
+                stats["throughput"] = stats["completed"] / (time.perf_counter() - stats.pop("started"))
+            self.stats = {
+                "queries": next_index,
+                "elapsed": elapsed,
+                "throughput": next_index / elapsed if elapsed else 0.0,
+                "workers": worker_stats,
+            }
+
+    def print_summary(self):
+        print(f"[Batch] {self.stats['queries']} queries in {self.stats['elapsed']:.1f}s "
+              f"({self.stats['throughput']:.2f} queries/s)", file=sys.stderr)
+        for shard, stats in sorted(self.stats["workers"].items()):
+            print(f"[Batch]   worker {shard}: {stats['completed']} done, {stats['succeeded']} ok, "
+                  f"{stats['crashes']} crashes, {stats['throughput']:.2f} queries/s", file=sys.stderr)
+
+
+def _worker_main(shard, worker_id, inbox, outbox, concurrency, automation_factory):
+    import asyncio
+    # workers log to stderr so stdout stays clean for results
+    sys.stdout = sys.stderr
+    asyncio.run(_worker_loop(shard, worker_id, inbox, outbox, concurrency, automation_factory))
+
+
+async def _worker_loop(shard, worker_id, inbox, outbox, concurrency, automation_factory):
+    import asyncio
+    from browser_pool import BrowserPool
+    from core_automation import BrowserAutomation
+    from session_state import SessionStore
+
+    if automation_factory:
+        automation = automation_factory()
+    else:
+        # each shard keeps its own sessions so processes don't share profile dirs
+        sessions = SessionStore(path=os.path.join(config.SESSION_DIR, f"worker-{shard}"))
+        # the parent already prepared the HAR scenario, workers only add their own files to it
+        pool = BrowserPool(size=1, contexts_per_browser=concurrency, sessions=sessions,
+                           archive=NetworkArchive(clean=False))
+        automation = BrowserAutomation(pool=pool)
+        automation.owns_pool = True
+
+    async def search(index, query):
+        outbox.put(("result", shard, worker_id, await automation.search_record(index, query)))
+
+    tasks = set()
+    outbox.put(("ready", shard, worker_id, concurrency))
+    try:
+        while True:
+            item = await asyncio.to_thread(inbox.get)
+            if item is None:
+                break
+            task = asyncio.create_task(search(*item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        await automation.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search a list of products across several processes")
+    parser.add_argument("file", nargs="?", help="one query per line (default: stdin)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None, help="searches in flight per worker")
+    args = parser.parse_args()
+
+    source = open(args.file) if args.file else sys.stdin
+    queries = [line.strip() for line in source if line.strip()]
+
+    runner = ShardedBatchRunner(workers=args.workers, concurrency=args.concurrency)
+    for record in runner.run(queries):
+        print(json.dumps(record), flush=True)
+    runner.print_summary()
+
+
+if __name__ == "__main__":
+    main()
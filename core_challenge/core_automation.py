@@ -5,95 +5,345 @@
 
 import asyncio
 import sys
+import time
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from playwright.async_api import async_playwright
-from utils import safe_goto, safe_click, safe_fill, safe_get_text, see_page_elements
+from browser_pool import BrowserPool
+from http_search import HttpSearch
+from tracing import traced
+from search_results import RESULT_SELECTOR, extract_search_results, first_product, get_next_page_url
+from utils import safe_goto, safe_click, safe_fill, see_page_elements, wait_for_ready, wait_for_element
 import config
 
 class BrowserAutomation:
     
-    def __init__(self):
+    def __init__(self, pool=None, cache=None):
+        # pass in a shared BrowserPool to reuse warm browsers, otherwise we make our own
+        self.pool = pool
+        self.owns_pool = pool is None
+        # optional ResultCache - when set, find_product() and search_many() skip repeat searches
+        self.cache = cache
+        self.lease = None
         self.browser = None
         self.page = None
+        self.batch_stats = {}
+        # plain HTTP fast path for find_product (see config.SEARCH_ENGINE), made on first use
+        self.http = None
+        self.searches = 0
+        self.engine_warned = False
+        # the one place search hit rates are counted - per search, so cooldown skips count as http misses
+        self.engine_stats = {
+            engine: {"attempts": 0, "hits": 0, "latency_total": 0.0, "misses": {}} for engine in ("http", "browser")
+        }
     
     async def setup(self):
-        """ start the browser and create page """
+        """ lease a page from the browser pool """
 
         print("\n[Setup] Starting browser...")
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=config.HEADLESS) # false because we want to see browser
-        self.page = await self.browser.new_page()
+        self._ensure_pool()
+        self.lease = await self.pool.acquire()
+        self.browser = self.lease.browser
+        self.page = self.lease.page
         print("[Setup] Browser ready!\n")
     
-    async def search_amazon(self, product_name):
-        """ go to amazon and search for a product """
+    @traced("search_amazon", "product_name")
+    async def search_amazon(self, product_name, page=None):
+        """ go to amazon and search for a product (on self.page unless another page is given) """
+        page = page or self.page
         print(f"\n[Search] Looking for: {product_name}")
         
         # first go to amazon
-        success = await safe_goto(self.page, "https://www.amazon.com")
+        success = await safe_goto(page, config.AMAZON_URL)
         if not success:
             return False
         
-        await asyncio.sleep(2)
+        # wait for the search box instead of sleeping a fixed amount
+        await wait_for_ready(page, selector="#twotabsearchtextbox")
         
         # find and fill the search box - upon inspecting the page, the search box is id "twotabsearchtextbox"
-        success = await safe_fill(self.page, "#twotabsearchtextbox", product_name)
+        success = await safe_fill(page, "#twotabsearchtextbox", product_name)
         if not success:
             return False
         
         # click the search button - upon inspecting the page, the search button is id "nav-search-submit-button"
-        success = await safe_click(self.page, "#nav-search-submit-button")
+        home_url = page.url
+        success = await safe_click(page, "#nav-search-submit-button")
         if not success:
             return False
         
-        await asyncio.sleep(2)
+        # move on as soon as the results page has navigated in and shows a result
+        await wait_for_ready(
+            page,
+            url_change_from=home_url,
+            selector=RESULT_SELECTOR,
+        )
         
         print("[Search] Search completed!\n")
         return True
     
-    async def get_first_product_info(self):
+    @traced("get_first_product_info")
+    async def get_first_product_info(self, page=None):
         """ get the name and price of the first product in results """
+        page = page or self.page
         print("[Extract] Getting product information...")
         
         # inspection shows that product title is found in an h2 specifically in the product result
-        # price is in a span with class "a-price-whole"
-        product_name = None
-        name_selector = "[data-component-type='s-search-result'] h2"
-        
-        product_name = await safe_get_text(self.page, name_selector)
-        if product_name and product_name.strip():
-            print(f"[Extract] Found name using selector: {name_selector}")
-        else: 
-            print("[Extract] Could not find product name")
+        # price is in a span with class "a-price-whole". we wait for the first result card, then
+        # read every card in one go (see search_results.py) rather than one selector at a time
+        if not await wait_for_element(page, RESULT_SELECTOR):
+            print("[Extract] Could not find any results")
             return None
         
-        product_price = None
-        price_selector = ".a-price-whole"
-        
-        product_price = await safe_get_text(self.page, price_selector)
-        if not product_price:
-            print("[Extract] Could not find product price")
+        records = await extract_search_results(page)
+        result = first_product(records)
+        if not result:
+            print("[Extract] Could not find product name and price")
             return None
         
-        result = {
-            "name": product_name.strip(),
-            "price": product_price.strip()
-        }
-        
         print(f"[Extract] Found product: {result['name']}") 
         print(f"[Extract] Price: ${result['price']}")
         
         return result
-     
+    
+    async def get_all_products_info(self, page=None, limit=None):
+        """ get every product on the results page (asin, title, price, rating, sponsored, position) """
+        page = page or self.page
+        if not await wait_for_element(page, RESULT_SELECTOR):
+            return []
+        
+        records = await extract_search_results(page, limit)
+        print(f"[Extract] Found {len(records)} products")
+        return records
+    
+    async def iter_search_results(self, product_name, max_pages=3, max_items=None, page=None):
+        """
+        search for a product and yield result records page by page
+
+        while you're working through one page of results, the next page is already loading
+        in a second tab. only one page of records is held at a time, so deep crawls stay small.
+        each record is the same as get_all_products_info() plus a "page" number
+        """
+        page = page or self.page
+        if not await self.search_amazon(product_name, page=page):
+            return
+        
+        # the second tab lives in the same context, so it shares cookies and the network filter
+        spare_page = await page.context.new_page()
+        current, other = page, spare_page
+        prefetch = None
+        yielded = 0
+        
+        try:
+            for page_number in range(1, max_pages + 1):
+                if not await wait_for_element(current, RESULT_SELECTOR):
+                    break
+                records = await extract_search_results(current)
+                
+                # start loading the next page before handing this one out
+                next_url = await get_next_page_url(current) if page_number < max_pages else None
+                if next_url:
+                    prefetch = asyncio.create_task(safe_goto(other, next_url))
+                
+                print(f"[Paginate] Page {page_number}: {len(records)} products")
+                for record in records:
+                    record["page"] = page_number
+                    yield record
+                    yielded += 1
+                    if max_items and yielded >= max_items:
+                        return
+                
+                if not prefetch or not await prefetch:
+                    break
+                prefetch = None
+                current, other = other, current
+        finally:
+            if prefetch and not prefetch.done():
+                prefetch.cancel()
+                try:
+                    await prefetch
+                except asyncio.CancelledError:
+                    pass
+            await spare_page.close()
+    
+    async def find_product(self, product_name):
+        """
+        search and get the first product in one call, going through the result cache if there is one
+
+        this uses its own page from the pool, so background cache refreshes don't fight over self.page
+        """
+        if self.cache is None:
+            return await self._search_and_extract(product_name)
+        return await self.cache.get_or_fetch(product_name, self._search_and_extract)
+    
+    async def _search_and_extract(self, product_name):
+        """ try the HTTP fast path first (unless config says otherwise), then the browser """
+        engine = config.SEARCH_ENGINE
+        self.searches += 1
+        # HAR record/replay only sees browser traffic, so those runs always use the browser
+        self._ensure_pool()
+        if engine != "browser" and self.pool.archive.mode != "live":
+            if not self.engine_warned:
+                print(f"[HTTP] SEARCH_ENGINE={engine} ignored in {self.pool.archive.mode} mode, using the browser")
+                self.engine_warned = True
+        elif engine != "browser":
+            if self.http is None:
+                self.http = HttpSearch()
+            start = time.perf_counter()
+            product, reason = await self.http.find_product(product_name)
+            self._count_engine("http", product, start, reason)
+            if product or engine == "http":
+                return product
+            print(f"[HTTP] Falling back to the browser ({reason})")
+
+        start = time.perf_counter()
+        product = await self._browser_search_and_extract(product_name)
+        self._count_engine("browser", product, start, None if product else "no_product")
+        return product
+
+    def _count_engine(self, engine, product, start, reason=None):
+        stats = self.engine_stats[engine]
+        stats["attempts"] += 1
+        stats["hits"] += product is not None
+        stats["latency_total"] += time.perf_counter() - start
+        if reason:
+            stats["misses"][reason] = stats["misses"].get(reason, 0) + 1
+
+    def engine_report(self):
+        """ hit rate and latency per search engine, and how many searches needed the browser """
+        report = {}
+        for engine, stats in self.engine_stats.items():
+            report[engine] = dict(stats, misses=dict(stats["misses"]))
+            report[engine]["hit_rate"] = stats["hits"] / stats["attempts"] if stats["attempts"] else 0.0
+            report[engine]["latency_avg"] = stats["latency_total"] / stats["attempts"] if stats["attempts"] else 0.0
+        report["searches"] = self.searches
+        report["browser_share"] = self.engine_stats["browser"]["attempts"] / self.searches if self.searches else 0.0
+        return report
+
+    async def _browser_search_and_extract(self, product_name):
+        """ search + get_first_product_info on a pooled page, None if either step fails """
+        self._ensure_pool()
+        async with self.pool.lease() as lease:
+            if not await self.search_amazon(product_name, page=lease.page):
+                return None
+            return await self.get_first_product_info(page=lease.page)
+    
+    async def search_record(self, index, query):
+        """ find_product as a batch result record - errors end up in the record instead of raising """
+        start = time.perf_counter()
+        product = None
+        error = None
+        try:
+            product = await self.find_product(query)
+            if not product:
+                error = "search failed or could not extract product info"
+        except Exception as e:
+            error = str(e)
+        return {
+            "index": index,
+            "query": query,
+            "product": product,
+            "error": error,
+            "latency": time.perf_counter() - start,
+        }
+    
+    def _ensure_pool(self, contexts_per_browser=None):
+        if self.pool is None:
+            self.pool = BrowserPool(size=1, contexts_per_browser=contexts_per_browser)
+    
+    async def search_many(self, queries, concurrency=4):
+        """
+        search for lots of products at once, with at most `concurrency` searches in flight
+
+        queries can be any iterable, or an async iterable (e.g. lines read off a pipe in a thread).
+        each search gets its own page from the pool, so one bad query can't break the others.
+        this is an async iterator that yields results as they finish (not in input order):
+            {"index": 0, "query": "...", "product": {...} or None, "error": None or "...", "latency": 1.23}
+
+        aggregate numbers for the last batch end up in self.batch_stats
+        (wrap it in contextlib.aclosing() if you might break out early, so leftover searches stop right away)
+        """
+        self._ensure_pool(max(concurrency, config.POOL_CONTEXTS_PER_BROWSER))
+
+        results = asyncio.Queue(maxsize=concurrency)
+        stats = {"queries": 0, "succeeded": 0, "failed": 0, "latency_total": 0.0, "latency_max": 0.0}
+        batch_start = time.perf_counter()
+
+        # workers pull queries lazily so huge query lists don't all become tasks up front
+        if hasattr(queries, "__aiter__"):
+            query_aiter = aiter(queries)
+            pull_lock = asyncio.Lock()  # an async generator can't be advanced by two workers at once
+            pulled = 0
+
+            async def next_query():
+                nonlocal pulled
+                async with pull_lock:
+                    try:
+                        query = await anext(query_aiter)
+                    except StopAsyncIteration:
+                        return None
+                    pulled += 1
+                    return pulled - 1, query
+        else:
+            query_iter = iter(enumerate(queries))
+
+            async def next_query():
+                return next(query_iter, None)
+
+        async def worker():
+            while (item := await next_query()) is not None:
+                await results.put(await self.search_record(*item))
+
+        async def run_workers():
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            await results.put(None)  # tells the consumer we're done
+
+        runner = asyncio.create_task(run_workers())
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+
+                stats["queries"] += 1
+                stats["succeeded" if result["error"] is None else "failed"] += 1
+                stats["latency_total"] += result["latency"]
+                stats["latency_max"] = max(stats["latency_max"], result["latency"])
+                yield result
+        finally:
+            # if the caller stops early, stop the remaining searches too
+            runner.cancel()
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
+
+            elapsed = time.perf_counter() - batch_start
+            stats["elapsed"] = elapsed
+            stats["throughput"] = stats["queries"] / elapsed if elapsed else 0.0
+            stats["latency_avg"] = stats["latency_total"] / stats["queries"] if stats["queries"] else 0.0
+            self.batch_stats = stats
+            stats["engines"] = self.engine_report()
+            print(f"[Batch] {stats['succeeded']}/{stats['queries']} searches succeeded "
+                  f"in {elapsed:.1f}s ({stats['throughput']:.2f} queries/s)")
+            engines = stats["engines"]
+            print(f"[Batch] HTTP fast path: {engines['http']['hits']}/{engines['http']['attempts']} hits "
+                  f"(avg {engines['http']['latency_avg'] * 1000:.0f}ms), browser: {engines['browser']['attempts']} "
+                  f"(avg {engines['browser']['latency_avg'] * 1000:.0f}ms, {engines['browser_share']:.0%} of searches)")
+
     async def cleanup(self):
         """ close the browser """
         print("\n[Cleanup] Closing browser...")
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        if self.cache:
+            await self.cache.wait_for_refreshes()
+        if self.lease:
+            await self.pool.release(self.lease)
+            self.lease = None
+        if self.pool and self.owns_pool:
+            await self.pool.close()
+            self.pool = None
+        if self.http:
+            await self.http.aclose()
         print("[Cleanup] Done\n")
 
     # dev assistance functions for debugging
@@ -1,7 +1,18 @@
 # main demo for the required core automation
 # this shows the complete workflow: open browser, search, extract info, close
+#
+# batch mode reads one query per line and prints one JSON record per result as it finishes:
+#     python3 core_main.py --batch queries.txt > results.jsonl
+#     cat queries.txt | python3 core_main.py --batch --concurrency 8 --checkpoint run.ckpt
 
+import argparse
 import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from contextlib import aclosing
 from core_automation import BrowserAutomation
 
 # what you'll find is that this is very brittle. in the event that you search
@@ -68,6 +79,127 @@ async def main():
     print("Demo complete!\n")
 
 
+READ_CHUNK_LINES = 256  # input lines read per trip to the reader thread
+
+
+class Checkpoint:
+    """
+    remembers which input lines are done so an interrupted batch can pick up where it left off
+
+    results finish out of order, so we keep a watermark (every line below it is done) plus
+    the few done lines above it - that stays small no matter how long the input is
+    """
+
+    def __init__(self, path, save_interval=1.0):
+        self.path = path
+        self.save_interval = save_interval
+        self.watermark = 0
+        self.done = set()
+        self._last_save = 0.0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.watermark = data["watermark"]
+            self.done = set(data["done"])
+            print(f"[Batch] Resuming from checkpoint: {self.watermark + len(self.done)} lines already done")
+
+    def is_done(self, line):
+        return line < self.watermark or line in self.done
+
+    def mark(self, line):
+        self.done.add(line)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+        if time.monotonic() - self._last_save > self.save_interval:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"watermark": self.watermark, "done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+        self._last_save = time.monotonic()
+
+
+async def run_batch(source, concurrency, checkpoint_path=None):
+    """
+    stream queries from `source` through search_many and write JSONL to stdout
+
+    input is read in small chunks on a thread (so a slow pipe never blocks the searches
+    already running) and search_many only keeps `concurrency` searches in flight, so
+    memory stays flat however long the input is. records come out in completion order with
+    the input line number. a checkpoint is saved about once a second, so after a crash a few
+    records may be written again on resume - dedupe on "line" if that matters
+    """
+    # logs go to stderr so stdout is nothing but records
+    out = sys.stdout
+    sys.stdout = sys.stderr
+
+    checkpoint = Checkpoint(checkpoint_path)
+    lines = {}  # search_many index -> input line number, only for searches in flight
+
+    async def queries():
+        sent = 0
+        line = 0
+        while chunk := await asyncio.to_thread(lambda: list(itertools.islice(source, READ_CHUNK_LINES))):
+            for text in chunk:
+                text = text.strip()
+                if not text:
+                    # nothing to search, but the watermark has to get past it (if it isn't already)
+                    if not checkpoint.is_done(line):
+                        checkpoint.mark(line)
+                elif not checkpoint.is_done(line):
+                    lines[sent] = line
+                    sent += 1
+                    yield text
+                line += 1
+
+    automation = BrowserAutomation()
+    batch_start = time.perf_counter()
+    try:
+        async with aclosing(automation.search_many(queries(), concurrency=concurrency)) as results:
+            async for result in results:
+                line = lines.pop(result["index"])
+                record = {
+                    "line": line,
+                    "query": result["query"],
+                    "product": result["product"],
+                    "error": result["error"],
+                    "latency_ms": round(result["latency"] * 1000, 1),
+                    "elapsed_ms": round((time.perf_counter() - batch_start) * 1000, 1),
+                    "finished_at": time.time(),
+                }
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                checkpoint.mark(line)
+    finally:
+        checkpoint.save()
+        await automation.cleanup()
+        sys.stdout = out
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # finished, next run starts from the top
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="search amazon for a product (or a whole batch of them)")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="read queries (one per line) from FILE, or stdin if no FILE, and print JSONL")
+    parser.add_argument("--concurrency", type=int, default=4, help="searches in flight at once in batch mode")
+    parser.add_argument("--checkpoint", metavar="PATH", help="save batch progress here and resume from it")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.batch is None:
+        asyncio.run(main())
+    elif args.batch == "-":
+        asyncio.run(run_batch(sys.stdin, args.concurrency, args.checkpoint))
+    else:
+        with open(args.batch) as source:
+            asyncio.run(run_batch(source, args.concurrency, args.checkpoint))
 
@@ -0,0 +1,229 @@
+# HTTP-only fast path for search results - no browser at all
+#
+# fetches the search page with a pooled httpx client and parses the result cards with the
+# stdlib HTML parser into the same records EXTRACT_RESULTS_JS builds in the browser.
+# anything that looks like a block (captcha, 503...) or a layout we can't parse comes back
+# as a reason instead of a result, so the caller can fall back to the browser.
+
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import quote_plus
+from search_results import first_product
+from tracing import span
+import config
+
+
+# elements that never get an end tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+
+SPONSORED_CLASSES = {"puis-sponsored-label-text", "s-sponsored-label-text", "puis-label-popover-default"}
+BLOCK_MARKERS = ("/errors/validateCaptcha", "api-services-support@amazon.com", "Type the characters you see")
+BLOCK_STATUSES = {403, 429, 503}
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+class ResultCardParser(HTMLParser):
+    """
+    streaming parse of amazon result cards into EXTRACT_RESULTS_JS-shaped records
+
+    mirrors the browser selectors: first h2 is the title, the first non-strikethrough .a-price
+    gives whole/fraction, the first .a-icon-alt is the rating
+    """
+
+    def __init__(self, limit=None):
+        super().__init__()
+        self.limit = limit
+        self.records = []
+        self.card = None
+        self._stack = []      # open tags inside the current card
+        self._capture = None  # (field, stack depth) while collecting a field's text
+        self._text = []
+        self._price_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.card is None:
+            if attrs.get("data-component-type") == "s-search-result":
+                if self.limit and len(self.records) >= self.limit:
+                    return
+                self.card = {
+                    "position": len(self.records) + 1,
+                    "asin": attrs.get("data-asin") or "",
+                    "title": "", "price_whole": "", "price_fraction": "", "rating": "", "_sponsored": "",
+                }
+                self._stack = [tag]
+            return
+        if tag in VOID_TAGS:
+            return
+
+        self._stack.append(tag)
+        if self._capture:
+            return
+
+        classes = set((attrs.get("class") or "").split())
+        field = None
+        if tag == "h2" and not self.card["title"]:
+            field = "title"
+        elif "a-price" in classes and "a-text-price" not in classes and self._price_depth is None \
+                and not self.card["price_whole"]:
+            self._price_depth = len(self._stack)
+        elif self._price_depth and "a-price-whole" in classes and not self.card["price_whole"]:
+            field = "price_whole"
+        elif self._price_depth and "a-price-fraction" in classes and not self.card["price_fraction"]:
+            field = "price_fraction"
+        elif "a-icon-alt" in classes and not self.card["rating"]:
+            field = "rating"
+        elif classes & SPONSORED_CLASSES and not self.card["_sponsored"]:
+            field = "_sponsored"
+
+        if field:
+            self._capture = (field, len(self._stack))
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if self.card is None or tag not in self._stack:
+            return
+        # close everything up to the matching tag, like a browser does with sloppy markup
+        while self._stack:
+            depth = len(self._stack)
+            if self._capture and depth == self._capture[1]:
+                self.card[self._capture[0]] = "".join(self._text).strip()
+                self._capture = None
+            if self._price_depth == depth:
+                self._price_depth = None
+            if self._stack.pop() == tag:
+                break
+        if not self._stack:
+            self._finish_card()
+
+    def handle_data(self, data):
+        if self._capture:
+            self._text.append(data)
+
+    def _finish_card(self):
+        card = self.card
+        card["price_whole"] = re.sub(r"[.,]$", "", card["price_whole"])
+        card["rating"] = (re.search(r"[0-9.]+", card["rating"]) or [""])[0]
+        card["sponsored"] = bool(re.search("sponsored", card.pop("_sponsored"), re.I))
+        self.records.append(card)
+        self.card = None
+        self._capture = None
+        self._price_depth = None
+
+
+def parse_search_results(html, limit=None):
+    """every result card in a search page's html, same shape as extract_search_results()"""
+    parser = ResultCardParser(limit)
+    parser.feed(html)
+    parser.close()
+    return parser.records
+
+
+def detect_block(status, url, html):
+    """why this response isn't a usable results page, or None if it looks fine"""
+    if status in BLOCK_STATUSES:
+        return f"status_{status}"
+    if "validateCaptcha" in url or any(marker in html for marker in BLOCK_MARKERS):
+        return "captcha"
+    if status != 200:
+        return f"status_{status}"
+    return None
+
+
+class HttpSearch:
+    """
+    searches over plain HTTP with one pooled (HTTP/2 if h2 is installed) client
+
+    after HTTP_MAX_BLOCKS blocks in a row it backs off for HTTP_BLOCK_COOLDOWN seconds,
+    so we don't pay for a doomed request before every browser fallback
+    """
+
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or config.AMAZON_URL).rstrip("/")
+        self._client = None
+        self._blocks_in_a_row = 0
+        self._cooldown_until = 0.0
+        # request-level numbers only - hit rates per search are counted by the caller (engine_report)
+        self.metrics = {"requests": 0, "skipped": 0, "latency_total": 0.0}
+
+    def available(self):
+        """False while cooling down after repeated blocks"""
+        return time.monotonic() >= self._cooldown_until
+
+    async def search(self, query, limit=None):
+        """returns (records, None) or ([], reason) - reason says why the browser should take over"""
+        if not self.available():
+            self.metrics["skipped"] += 1
+            return [], "cooldown"
+
+        client = self._get_client()
+        start = time.perf_counter()
+        self.metrics["requests"] += 1
+        with span("http_search", query=query) as s:
+            try:
+                response = await client.get(f"{self.base_url}/s?k={quote_plus(query)}")
+                html = response.text
+                reason = detect_block(response.status_code, str(response.url), html)
+                records = [] if reason else parse_search_results(html, limit)
+                if not reason and not records:
+                    reason = "no_cards"  # new layout, or no results - let the browser decide
+            except Exception as e:
+                print(f"[HTTP] Request failed: {e}")
+                records, reason = [], "error"
+            s.set(reason=reason, records=len(records))
+        self.metrics["latency_total"] += time.perf_counter() - start
+
+        if reason == "captcha" or (reason or "").startswith("status_"):
+            self._blocks_in_a_row += 1
+            if self._blocks_in_a_row >= config.HTTP_MAX_BLOCKS:
+                print(f"[HTTP] Blocked {self._blocks_in_a_row} times in a row, using the browser for "
+                      f"{config.HTTP_BLOCK_COOLDOWN}s")
+                self._cooldown_until = time.monotonic() + config.HTTP_BLOCK_COOLDOWN
+                self._blocks_in_a_row = 0
+        elif reason is None:
+            self._blocks_in_a_row = 0
+        return records, reason
+
+    async def find_product(self, query):
+        """(product, None) in get_first_product_info's shape, or (None, reason) to fall back"""
+        records, reason = await self.search(query)
+        product = first_product(records) if records else None
+        if product:
+            return product, None
+        return None, reason or "no_product"
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats["latency_avg"] = stats["latency_total"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    async def aclose(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            try:
+                import h2  # noqa: F401 - httpx only speaks HTTP/2 when h2 is installed
+                http2 = True
+            except ImportError:
+                http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                headers=HEADERS,
+                follow_redirects=True,
+                timeout=config.HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=config.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.HTTP_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
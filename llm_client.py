@@ -5,43 +5,322 @@
 # i've tested this with mine, and it works. i was not sure of whether I should be sharing my personal
 # key, so it is not included in this repo.
 
+import asyncio
 import json
-from anthropic import Anthropic
+import random
+from mcp_context import compact_context, format_element
+from plan_cache import PlanCache
+from tracing import span
 import config
 
 
+# anthropic and httpx take ~0.5s to import, so they're only imported once a request is actually made
+def retryable_errors():
+    """errors worth trying again - network trouble, timeouts, rate limits and 5xx/overloaded"""
+    from anthropic import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+class PlanStreamParser:
+    """
+    incremental parser for a streamed JSON array of action objects
+
+    feed() it text as it arrives and it hands back every object that has been closed off
+    since the last call. anything before the opening "[" (like a ```json fence) is skipped
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        finished = []
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if not self.started:
+                self.started = ch == "["
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.object_start = self.pos
+                self.depth += 1
+            elif ch == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        finished.append(json.loads(self.buffer[self.object_start:self.pos + 1]))
+                    except json.JSONDecodeError as e:
+                        print(f"[LLM] Skipping unparseable step: {e}")
+                    # everything up to here is done with, so don't keep it around
+                    self.buffer = self.buffer[self.pos + 1:]
+                    self.pos = -1
+                    self.object_start = None
+            self.pos += 1
+
+        return finished
+
+
 class LLMClient:
     """client for talking to claude 3.5 sonnet"""
     
-    def __init__(self):
-        if not config.ANTHROPIC_API_KEY:
+    def __init__(self, plan_cache=None, api_key=None, base_url=None):
+        self.api_key = api_key or config.ANTHROPIC_API_KEY
+        if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY not set in .env file")
         
-        self.client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
+        # base_url lets us point at a local stand-in server for testing
+        self.base_url = base_url or config.ANTHROPIC_BASE_URL
+        self.client = None  # made on first use, see _get_client
         self.model = "claude-haiku-4-5-20251001" 
+        
+        # the async client is made on first use (it has to live on the running event loop)
+        self.async_client = None
+        self._http_client = None
+        self._semaphore = None
+        
+        # repeat goals on the same page layout reuse the old plan instead of calling Claude
+        if plan_cache is None and config.PLAN_CACHE_ENABLED:
+            plan_cache = PlanCache()
+        self.plan_cache = plan_cache
+    
+    def invalidate_plan(self, goal, page_context):
+        """forget the cached plan for this goal/page, e.g. because one of its steps failed"""
+        if self.plan_cache:
+            self.plan_cache.invalidate(goal, page_context)
+            print("[LLM] Dropped cached plan")
     
-    def generate_plan(self, goal, page_context):
+    async def invalidate_plan_async(self, goal, page_context):
+        """same as invalidate_plan, without blocking the event loop on sqlite"""
+        if self.plan_cache:
+            await self.plan_cache.invalidate_async(goal, page_context)
+            print("[LLM] Dropped cached plan")
+    
+    def generate_plan(self, goal, page_context, progress=None):
         """
         send the goal and page context to Claude
         get back a list of actions to perform
         
+        this blocks until Claude answers - from async code use generate_plan_async instead
+        
         args passed in:
             goal: what the user wants to do
             page_context: the MCP context
+            progress: when replanning after a failure, {"done": [steps that worked], "failed": step}
+                      - Claude then only plans the rest of the goal (these plans aren't cached)
         
         returns:
             list of actions like [{"action": "fill", "selector": "#search", "text": "dinosaur"}, ...]
         """
         
+        plan = self._cached_plan(goal, page_context, progress)
+        if plan:
+            return plan
+        
+        system_prompt, user_prompt = self.build_prompts(goal, page_context, progress)
+        
+        print("\n[LLM] Sending request to Claude...")
+        
+        # call Claude API
+        with span("generate_plan", mode="sync") as s:
+            response = self._get_client().messages.create(
+                model=self.model,
+                max_tokens=2000,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_prompt}]
+            )
+            s.set(input_tokens=response.usage.input_tokens, output_tokens=response.usage.output_tokens)
+        
+        plan = self._plan_from_response(response)
+        if self.plan_cache and plan and not progress:
+            self.plan_cache.set(goal, page_context, plan)
+        return plan
+    
+    async def generate_plan_async(self, goal, page_context, progress=None):
+        """
+        same as generate_plan, but doesn't block the event loop while Claude thinks
+        
+        requests share one pooled connection, at most config.LLM_MAX_CONCURRENCY run at once,
+        and connection errors / timeouts / rate limits / 5xx are retried with jittered backoff
+        """
+        
+        plan = await self._cached_plan_async(goal, page_context, progress)
+        if plan:
+            return plan
+        
+        system_prompt, user_prompt = self.build_prompts(goal, page_context, progress)
+        client = self._get_async_client()
+        
+        print("\n[LLM] Sending request to Claude...")
+        
+        with span("generate_plan", mode="async") as s:
+            for attempt in range(config.LLM_MAX_RETRIES + 1):
+                try:
+                    async with self._semaphore:
+                        response = await client.messages.create(
+                            model=self.model,
+                            max_tokens=2000,
+                            system=system_prompt,
+                            messages=[{"role": "user", "content": user_prompt}]
+                        )
+                    break
+                except retryable_errors() as e:
+                    if attempt == config.LLM_MAX_RETRIES:
+                        print(f"[LLM] Giving up after {attempt + 1} attempts: {e}")
+                        s.set(outcome="failure", attempts=attempt + 1)
+                        return []
+                    
+                    await self._backoff(attempt, e)
+            s.set(attempts=attempt + 1, input_tokens=response.usage.input_tokens,
+                  output_tokens=response.usage.output_tokens)
+        
+        plan = self._plan_from_response(response)
+        if self.plan_cache and plan and not progress:
+            await self.plan_cache.set_async(goal, page_context, plan)
+        return plan
+    
+    async def stream_plan(self, goal, page_context, progress=None):
+        """
+        like generate_plan_async, but yields each action the moment Claude finishes writing it
+        
+        the JSON array is parsed as the tokens come in, so the first action can start running
+        while Claude is still writing the rest. the full plan gets cached once the stream ends
+        """
+        
+        plan = await self._cached_plan_async(goal, page_context, progress)
+        if plan:
+            for step in plan:
+                yield step
+            return
+        
+        system_prompt, user_prompt = self.build_prompts(goal, page_context, progress)
+        client = self._get_async_client()
+        
+        print("\n[LLM] Streaming plan from Claude...")
+        
+        plan = []
+        with span("stream_plan") as s:
+            started = asyncio.get_running_loop().time()
+            for attempt in range(config.LLM_MAX_RETRIES + 1):
+                parser = PlanStreamParser()
+                try:
+                    async with self._semaphore:
+                        async with client.messages.stream(
+                            model=self.model,
+                            max_tokens=2000,
+                            system=system_prompt,
+                            messages=[{"role": "user", "content": user_prompt}]
+                        ) as stream:
+                            async for text in stream.text_stream:
+                                for step in parser.feed(text):
+                                    if not plan:
+                                        s.set(first_step_ms=(asyncio.get_running_loop().time() - started) * 1000)
+                                    plan.append(step)
+                                    yield step
+                            usage = (await stream.get_final_message()).usage
+                            s.set(input_tokens=usage.input_tokens, output_tokens=usage.output_tokens)
+                    break
+                except retryable_errors() as e:
+                    # once actions have gone out we can't take them back, so only retry before that
+                    if plan or attempt == config.LLM_MAX_RETRIES:
+                        print(f"[LLM] Stream failed after {len(plan)} steps: {e}")
+                        s.set(outcome="failure", steps=len(plan))
+                        return
+                    await self._backoff(attempt, e)
+            s.set(attempts=attempt + 1, steps=len(plan))
+        
+        print(f"[LLM] Streamed plan with {len(plan)} steps")
+        if self.plan_cache and plan and not progress:
+            await self.plan_cache.set_async(goal, page_context, plan)
+    
+    async def _backoff(self, attempt, error):
+        # exponential backoff with full jitter so parallel clients don't retry in lockstep
+        delay = random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+        print(f"[LLM] Request failed ({error.__class__.__name__}), retrying in {delay:.2f}s...")
+        await asyncio.sleep(delay)
+    
+    async def aclose(self):
+        """close the pooled async connection"""
+        if self._http_client:
+            await self._http_client.aclose()
+            self._http_client = None
+            self.async_client = None
+    
+    def _get_client(self):
+        if self.client is None:
+            from anthropic import Anthropic
+            self.client = Anthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=config.LLM_TIMEOUT,
+                max_retries=config.LLM_MAX_RETRIES,
+            )
+        return self.client
+    
+    def _get_async_client(self):
+        if self.async_client is None:
+            import httpx
+            from anthropic import AsyncAnthropic
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.LLM_MAX_CONNECTIONS,
+                ),
+                timeout=config.LLM_TIMEOUT,
+            )
+            self.async_client = AsyncAnthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=config.LLM_TIMEOUT,
+                max_retries=0,  # we do our own retries above
+                http_client=self._http_client,
+            )
+            self._semaphore = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
+        return self.async_client
+    
+    def _cached_plan(self, goal, page_context, progress=None):
+        if self.plan_cache and not progress:
+            plan = self.plan_cache.get(goal, page_context)
+            if plan:
+                print(f"[LLM] Using cached plan with {len(plan)} steps")
+                return plan
+        return None
+    
+    async def _cached_plan_async(self, goal, page_context, progress=None):
+        if self.plan_cache and not progress:
+            plan = await self.plan_cache.get_async(goal, page_context)
+            if plan:
+                print(f"[LLM] Using cached plan with {len(plan)} steps")
+                return plan
+        return None
+    
+    def build_prompts(self, goal, page_context, progress=None):
+        """the (system prompt, user prompt) pair we send to Claude"""
+        
         # this is the system prompt that teaches Claude what actions it can use
         system_prompt = """You are a web automation expert. Given a user's goal and the current webpage state, generate a step-by-step plan.
 
                         Available actions:
                         - fill: Fill an input field
-                        Format: {"action": "fill", "selector": "css selector", "text": "text to type"}
+                        Format: {"action": "fill", "mcp_id": 12, "text": "text to type"}
                         
                         - click: Click an element  
-                        Format: {"action": "click", "selector": "css selector"}
+                        Format: {"action": "click", "mcp_id": 13}
                         
                         - goto: Navigate to URL
                         Format: {"action": "goto", "url": "https://example.com"}
@@ -49,7 +328,11 @@ class LLMClient:
                         - wait: Wait for page to load
                         Format: {"action": "wait", "seconds": 2}
 
-                        Based on the page context, choose the best selectors. Prefer IDs over other selectors.
+                        Any action can also say what should be true once it's done, so we can check it:
+                        "expect": {"url_change": true} or {"url_contains": "/s?k="} or {"selector": "css selector"}
+
+                        Refer to elements by the mcp_id shown next to them in the page context.
+                        Only if an element has no mcp_id, use "selector": "css selector" instead (prefer IDs).
                         Return ONLY a JSON array of actions. No explanation, just the JSON."""
 
         # get theuser prompt with goal and context
@@ -62,27 +345,29 @@ class LLMClient:
                         Interactive Elements:
                         """
             
+        # keep the elements that matter for this goal, up to config.PROMPT_TOKEN_BUDGET
+        compacted = compact_context(page_context, goal)
+        print(f"[LLM] Page context: {len(compacted['interactive_elements'])} elements, "
+              f"~{compacted['context_tokens']} tokens ({compacted['dropped_elements']} dropped)")
+        
         # add info about each element
-        for i, elem in enumerate(page_context['interactive_elements'][:10]):
-            user_prompt += f"\n{i+1}. {elem['tag']}"
-            if elem['id']:
-                user_prompt += f" (id='{elem['id']}')"
-            if elem['text']:
-                user_prompt += f" - '{elem['text'][:50]}'"
-            if elem['placeholder']:
-                user_prompt += f" - placeholder: '{elem['placeholder']}'"
+        for i, elem in enumerate(compacted['interactive_elements']):
+            user_prompt += "\n" + format_element(i + 1, elem)
         
-        user_prompt += "\n\nGenerate the action plan as a JSON array:"
+        # when replanning, tell Claude what already happened so it only plans the rest
+        if progress:
+            user_prompt += "\n\nSteps already completed:"
+            for step in progress.get("done", []):
+                user_prompt += f"\n- {json.dumps(step)}"
+            user_prompt += f"\n\nThis step FAILED: {json.dumps(progress.get('failed'))}"
+            user_prompt += "\nThe page above is the current state. Plan only the remaining steps."
         
-        print("\n[LLM] Sending request to Claude...")
+        user_prompt += "\n\nGenerate the action plan as a JSON array:"
         
-        # call Claude API
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=2000,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
-        )
+        return system_prompt, user_prompt
+    
+    def _plan_from_response(self, response):
+        """pull the JSON plan out of Claude's response"""
         
         # extract the text response
         response_text = response.content[0].text
@@ -1,51 +1,114 @@
 # MCP (Model Context Protocol) implementation
 # this extracts structured info about the current webpage for the AI
 
-async def get_page_context(page):
+import re
+from urllib.parse import urlparse
+from tracing import span
+import config
+
+# shared in-page helpers for finding and describing interactive elements.
+# visibility uses checkVisibility() where the browser has it (no forced layout like offsetParent),
+# and text comes from textContent instead of innerText for the same reason
+ELEMENT_HELPERS_JS = """
+    const INTERACTIVE_SELECTOR = 'a, button, input:not([type=hidden]), select, textarea, ' +
+        '[role=button], [role=link], [role=textbox], [role=searchbox], [role=combobox], ' +
+        '[role=checkbox], [role=radio], [role=switch], [role=tab], [role=menuitem], [role=option]';
+    const SKIP_TAGS = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'SVG', 'HEAD']);
+
+    const isVisible = (el) => el.checkVisibility
+        ? el.checkVisibility({visibilityProperty: true})
+        : el.offsetParent !== null;
+
+    const describe = (el) => ({
+        tag: el.tagName.toLowerCase(),
+        type: el.type || '',
+        role: el.getAttribute('role') || '',
+        text: (el.textContent || '').replace(/\\s+/g, ' ').trim().substring(0, 100),
+        placeholder: el.placeholder || '',
+        id: el.id || '',
+        name: el.getAttribute('name') || '',
+        href: el.href || '',
+        aria_label: el.getAttribute('aria-label') || ''
+    });
+
+    // every element we report gets a stable data-mcp-id, and the registry maps the id straight
+    // back to the element so actions can find it without a selector search
+    const registry = window.__mcpRegistry || (window.__mcpRegistry = {nextId: 1, elements: new Map()});
+    const tagElement = (el) => {
+        let mcpId = Number(el.getAttribute('data-mcp-id'));
+        if (!mcpId || registry.elements.get(mcpId) !== el) {
+            mcpId = registry.nextId++;
+            el.setAttribute('data-mcp-id', mcpId);
+            registry.elements.set(mcpId, el);
+        }
+        return mcpId;
+    };
+
+    // one pass over root's subtree in document order, skipping subtrees that can't hold anything
+    // interactive. visit(el) is called for every visible interactive element and returns false
+    // to stop the walk early
+    const walkInteractive = (root, visit) => {
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT, {
+            acceptNode: (el) => SKIP_TAGS.has(el.tagName.toUpperCase())
+                ? NodeFilter.FILTER_REJECT
+                : NodeFilter.FILTER_ACCEPT
+        });
+        for (let el = walker.nextNode(); el; el = walker.nextNode()) {
+            if (el.matches(INTERACTIVE_SELECTOR) && isVisible(el) && visit(el) === false) return;
+        }
+    };
+"""
+
+SCAN_JS = """
+    (maxElements) => {
+        """ + ELEMENT_HELPERS_JS + """
+
+        // stops as soon as we have enough elements
+        const interactive = [];
+        if (maxElements <= 0) return interactive;
+        walkInteractive(document.body || document.documentElement, (el) => {
+            interactive.push({...describe(el), mcp_id: tagElement(el)});
+            return interactive.length < maxElements;
+        });
+        return interactive;
+    }
+"""
+
+# roles from the accessibility tree that the AI can act on
+INTERACTIVE_ROLES = {
+    "button", "link", "textbox", "searchbox", "combobox", "checkbox", "radio",
+    "switch", "tab", "menuitem", "option", "listbox", "spinbutton", "slider",
+}
+
+
+async def get_page_context(page, backend=None):
     """
     extract structured information about the current page
     this is what i'll send to the AI so it knows what's on the page
     
+    backend is "dom" (walk the page's DOM) or "accessibility" (use chromium's accessibility
+    tree - no DOM walk at all, elements come with role= selectors); defaults to config.MCP_BACKEND
+    
     returns dict with:
     - title: page title
     - url: current url  
     - interactive_elements: list of buttons, inputs, links the AI can interact with
     """
     
-    # basic page info
-    title = await page.title()
-    url = page.url
-    
-    # we use javascript to extract this info from the browser
-    # BeautifulSoup could be used too, but playwright would probably
-    # be better with JavaScript.
-    elements = await page.evaluate("""
-        () => {
-            const interactive = [];
-            
-            // find all buttons, inputs, and links
-            const selectors = ['button', 'input', 'a'];
-            
-            selectors.forEach(selector => {
-                document.querySelectorAll(selector).forEach((el, idx) => {
-                    // only include visible elements
-                    if (el.offsetParent !== null) {
-                        interactive.push({
-                            tag: el.tagName.toLowerCase(),
-                            type: el.type || '',
-                            text: el.innerText?.substring(0, 100) || '',
-                            placeholder: el.placeholder || '',
-                            id: el.id || '',
-                            name: el.name || '',
-                            href: el.href || ''
-                        });
-                    }
-                });
-            });
-            
-            return interactive.slice(0, 50); // lets limit to 20 elements
-        }
-    """)
+    backend = backend or config.MCP_BACKEND
+    with span("get_page_context", backend=backend) as s:
+        # basic page info
+        title = await page.title()
+        url = page.url
+        
+        if backend == "accessibility":
+            elements = await get_accessibility_elements(page)
+        else:
+            # we use javascript to extract this info from the browser
+            # BeautifulSoup could be used too, but playwright would probably
+            # be better with JavaScript.
+            elements = await page.evaluate(SCAN_JS, config.MCP_MAX_ELEMENTS)
+        s.set(elements=len(elements))
     
     context = {
         "title": title,
@@ -56,6 +119,320 @@ async def get_page_context(page):
     return context
 
 
+async def get_accessibility_elements(page, max_elements=None):
+    """interactive elements from the accessibility tree, in the same shape as the DOM scan"""
+    max_elements = max_elements or config.MCP_MAX_ELEMENTS
+    tree = await page.accessibility.snapshot(interesting_only=True)
+    elements = []
+    
+    # depth first, same order the DOM walk would give us
+    stack = [tree] if tree else []
+    while stack and len(elements) < max_elements:
+        node = stack.pop()
+        stack.extend(reversed(node.get("children", [])))
+        
+        role = node.get("role", "")
+        if role not in INTERACTIVE_ROLES or node.get("disabled"):
+            continue
+        name = node.get("name", "")
+        elements.append({
+            "tag": role,
+            "type": "",
+            "role": role,
+            "text": name[:100],
+            "placeholder": node.get("description", "") if role in ("textbox", "searchbox", "combobox") else "",
+            "id": "",
+            "name": "",
+            "href": "",
+            "aria_label": "",
+            # playwright understands role selectors, so the AI can still point at these
+            "selector": f'role={role}[name="{name[:80]}"]' if name else f"role={role}",
+        })
+    return elements
+
+
+# incremental context - a MutationObserver in the page keeps track of what changed, so
+# after the first snapshot we only send back the elements that were added/removed/changed
+
+TRACKER_JS = """
+    ([maxElements, reset]) => {
+        """ + ELEMENT_HELPERS_JS + """
+        let state = window.__mcpContext;
+
+        // a new document (navigation) means no state, so we start over with a full snapshot
+        const full = reset || !state;
+        if (full) {
+            if (state) state.observer.disconnect();
+            state = window.__mcpContext = {known: new Map(), dirty: new Set()};
+            state.observer = new MutationObserver(records => {
+                for (const record of records) {
+                    // our own id tagging isn't a change worth rescanning for
+                    if (record.attributeName === 'data-mcp-id') continue;
+                    state.dirty.add(record.target);
+                }
+            });
+            state.observer.observe(document.documentElement, {
+                childList: true, subtree: true, attributes: true, characterData: true
+            });
+        }
+
+        const result = {full, added: [], changed: [], removed: [], title: document.title, url: location.href};
+
+        // anything we reported before that is gone or hidden now
+        for (const [el, entry] of state.known) {
+            if (!el.isConnected || !isVisible(el)) {
+                result.removed.push(entry.mcp_id);
+                state.known.delete(el);
+                if (!el.isConnected) registry.elements.delete(entry.mcp_id);
+            }
+        }
+
+        const seen = new Set();
+        const visit = (el) => {
+            if (seen.has(el)) return true;
+            seen.add(el);
+
+            const description = describe(el);
+            const key = JSON.stringify(description);
+            const entry = state.known.get(el);
+
+            if (!entry) {
+                if (state.known.size >= maxElements) return !full;
+                const mcp_id = tagElement(el);
+                state.known.set(el, {mcp_id, key});
+                result.added.push({...description, mcp_id});
+            } else if (entry.key !== key) {
+                entry.key = key;
+                result.changed.push({...description, mcp_id: entry.mcp_id});
+            }
+            // a full snapshot only adds, so it can stop as soon as it's full
+            return !full || state.known.size < maxElements;
+        };
+
+        // a full snapshot is the same early-stopping walk as SCAN_JS, after that we only
+        // look inside the parts of the page that mutated since last time
+        if (full) {
+            if (maxElements > 0) walkInteractive(document.body || document.documentElement, visit);
+            state.dirty.clear();
+            return result;
+        }
+
+        const roots = [...state.dirty];
+        state.dirty.clear();
+        for (let root of roots) {
+            if (root.nodeType === Node.TEXT_NODE) root = root.parentElement;
+            if (!root || !root.isConnected) continue;
+
+            // the mutated node itself (or the control it sits inside), then everything under it
+            const owner = root.closest ? root.closest(INTERACTIVE_SELECTOR) : null;
+            if (owner && isVisible(owner)) visit(owner);
+            walkInteractive(root, visit);
+        }
+        return result;
+    }
+"""
+
+
+class ContextTracker:
+    """
+    keeps a running copy of the page context, updated from in-page deltas
+
+    the first call (and the first call after a navigation) is a full snapshot, after that the
+    cost scales with what changed on the page rather than with the size of the page
+
+    usage:
+        tracker = ContextTracker(page)
+        context = await tracker.get_context()   # same shape as get_page_context()
+        ... click something ...
+        changes = await tracker.get_changes()   # just the delta
+    """
+
+    def __init__(self, page, max_elements=None):
+        self.page = page
+        self.max_elements = max_elements or config.MCP_MAX_ELEMENTS
+        self.elements = {}  # mcp_id -> element info, in the order we found them
+        self.title = ""
+        self.url = ""
+        self._reset = True
+
+    async def get_changes(self):
+        """
+        what changed since the last call
+
+        returns dict with full (True if this was a whole new snapshot), added, changed,
+        removed (mcp_ids), title and url
+        """
+        with span("context_changes") as s:
+            changes = await self.page.evaluate(TRACKER_JS, [self.max_elements, self._reset])
+            s.set(full=changes["full"], added=len(changes["added"]),
+                  changed=len(changes["changed"]), removed=len(changes["removed"]))
+        self._reset = False
+
+        if changes["full"]:
+            self.elements = {}
+        for mcp_id in changes["removed"]:
+            self.elements.pop(mcp_id, None)
+        for elem in changes["added"] + changes["changed"]:
+            self.elements[elem["mcp_id"]] = elem
+
+        self.title = changes["title"]
+        self.url = changes["url"]
+        return changes
+
+    async def get_context(self):
+        """the full current context, built from our copy after applying the latest changes"""
+        await self.get_changes()
+        return {
+            "title": self.title,
+            "url": self.url,
+            "interactive_elements": list(self.elements.values()),
+        }
+
+    def reset(self):
+        """force the next call to take a full snapshot"""
+        self._reset = True
+
+
+async def resolve_mcp_id(page, mcp_id):
+    """
+    turn an mcp_id from the context into a selector for it, or None if it isn't on the page
+
+    this is a single registry lookup in the page, so a bad id fails right away instead of
+    waiting out a selector timeout
+    """
+    try:
+        found = await page.evaluate("""
+            (mcpId) => {
+                const el = window.__mcpRegistry?.elements.get(mcpId);
+                return !!(el && el.isConnected);
+            }
+        """, int(mcp_id))
+    except Exception:
+        return None
+    return f'[data-mcp-id="{int(mcp_id)}"]' if found else None
+
+
+# context compaction - decides which elements actually make it into the prompt
+
+INPUT_TYPES = {"", "text", "search", "email", "number", "tel", "url", "password"}
+# ARIA roles that stand in for those tags - custom widgets, and everything the accessibility
+# backend returns (which only has a role)
+INPUT_ROLES = {"textbox", "searchbox", "combobox"}
+STOP_WORDS = {"a", "an", "the", "for", "on", "in", "to", "of", "and", "some", "find", "search", "go"}
+
+
+def estimate_tokens(text):
+    """rough token count (about 4 characters per token for english)"""
+    return len(text) // 4 + 1
+
+
+def format_element(number, elem):
+    """one line describing an element, exactly as it goes in the prompt"""
+    line = f"{number}. {elem['tag']}"
+    if elem.get('mcp_id'):
+        line += f" [mcp_id={elem['mcp_id']}]"
+    if elem.get('id'):
+        line += f" (id='{elem['id']}')"
+    if elem.get('text'):
+        line += f" - '{elem['text'][:50]}'"
+    if elem.get('placeholder'):
+        line += f" - placeholder: '{elem['placeholder']}'"
+    if elem.get('aria_label') and elem['aria_label'] != elem.get('text'):
+        line += f" - aria-label: '{elem['aria_label'][:50]}'"
+    if elem.get('selector'):
+        line += f" - selector: {elem['selector']}"
+    return line
+
+
+def score_element(elem, goal_words):
+    """how useful an element probably is for reaching the goal - higher is better"""
+    tag = elem.get('tag', '')
+    role = elem.get('role', '')
+    score = 0.0
+
+    # things you can type into or press matter more than the hundreds of nav links
+    if (tag == 'input' and elem.get('type', '') in INPUT_TYPES) or role in INPUT_ROLES:
+        score += 6
+    elif tag in ('textarea', 'select'):
+        score += 5
+    elif tag == 'button' or role == 'button' or elem.get('type') in ('submit', 'button'):
+        score += 4
+    elif tag == 'a' or role == 'link':
+        score += 1
+
+    # ids and names make for reliable selectors
+    if elem.get('id'):
+        score += 2
+    if elem.get('name'):
+        score += 1
+    if elem.get('placeholder') or elem.get('aria_label'):
+        score += 1
+
+    # words from the goal showing up in the element
+    haystack = " ".join([
+        elem.get('text', ''), elem.get('placeholder', ''), elem.get('aria_label', ''),
+        elem.get('id', ''), elem.get('name', ''),
+    ]).lower()
+    score += 3 * sum(1 for word in goal_words if word in haystack)
+
+    # links with no text are almost never what we want
+    if (tag == 'a' or role == 'link') and not (elem.get('text') or elem.get('aria_label')):
+        score -= 2
+    return score
+
+
+def _dedupe_key(elem):
+    """near-identical links (same text, same path) collapse into one"""
+    if elem.get('tag') != 'a':
+        return None
+    text = re.sub(r"\s+", " ", (elem.get('text') or elem.get('aria_label') or '')).strip().lower()
+    return (text, urlparse(elem.get('href', '')).path)
+
+
+def compact_context(page_context, goal, token_budget=None):
+    """
+    pick the elements most relevant to the goal that fit in the token budget
+
+    returns a copy of page_context with:
+    - interactive_elements: the chosen elements, still in page order
+    - context_tokens: estimated tokens those elements take up in the prompt
+    - dropped_elements: how many elements didn't make it
+    """
+    token_budget = token_budget or config.PROMPT_TOKEN_BUDGET
+    goal_words = [w for w in re.findall(r"[a-z0-9]+", goal.lower()) if w not in STOP_WORDS]
+    elements = page_context['interactive_elements']
+
+    # dedupe first, keeping the first copy of each link
+    seen = set()
+    candidates = []
+    for position, elem in enumerate(elements):
+        key = _dedupe_key(elem)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        candidates.append((score_element(elem, goal_words), position, elem))
+
+    # best first, then fill up the budget
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+    chosen = []
+    used = 0
+    for score, position, elem in candidates:
+        # line numbers are at most 3 digits, so "999. " is a safe estimate
+        cost = estimate_tokens(format_element(999, elem)) + 1
+        if used + cost > token_budget:
+            continue
+        chosen.append((position, elem))
+        used += cost
+
+    chosen.sort()
+    compacted = dict(page_context)
+    compacted['interactive_elements'] = [elem for _, elem in chosen]
+    compacted['context_tokens'] = used
+    compacted['dropped_elements'] = len(elements) - len(chosen)
+    return compacted
+
+
 async def print_page_context(page):
     """helper to see what context we're getting"""
     context = await get_page_context(page)
@@ -0,0 +1,96 @@
+# HAR record/replay so debug and regression runs don't have to go back to the network
+#
+# three modes (config.NETWORK_MODE):
+#   live    - normal, nothing recorded
+#   record  - every context writes its traffic to a HAR under HAR_DIR/<scenario>/
+#   replay  - every request is answered from that scenario's HARs, misses are aborted
+#             or sent to the network depending on HAR_NOT_FOUND
+#
+# replaying the same archive against old and new code means any slowdown is ours, not the site's
+
+import itertools
+import os
+import shutil
+from pathlib import Path
+import config
+
+
+MODES = ("live", "record", "replay")
+MAX_MISSED_URLS = 20  # how many missed urls to keep around for the stats
+
+
+class NetworkArchive:
+    """records contexts to HAR files or serves them back through context routing"""
+
+    def __init__(self, mode=None, scenario=None, har_dir=None, not_found=None, clean=True):
+        self.mode = mode or config.NETWORK_MODE
+        if self.mode not in MODES:
+            raise ValueError(f"network mode must be one of {MODES}, got {self.mode!r}")
+        self.scenario = scenario or config.HAR_SCENARIO
+        self.not_found = not_found or config.HAR_NOT_FOUND  # "abort" or "fallback"
+        self.path = Path(har_dir or config.HAR_DIR) / self.scenario
+        # recording wipes the scenario first - off when another process already did that and
+        # is recording into the same scenario alongside us (batch workers)
+        self.clean = clean
+
+        self._counter = itertools.count()
+        self._prepared = False
+        self.metrics = {"contexts": 0, "misses": 0, "missed_urls": []}
+
+    def prepare(self):
+        """recording starts the scenario from scratch, replaying needs it to exist"""
+        if self._prepared or self.mode == "live":
+            return
+        if self.mode == "record":
+            if self.clean:
+                shutil.rmtree(self.path, ignore_errors=True)
+            self.path.mkdir(parents=True, exist_ok=True)
+            print(f"[Network] Recording to {self.path}")
+        elif not self.har_files():
+            raise FileNotFoundError(f"no recorded HARs for scenario {self.scenario!r} in {self.path}")
+        else:
+            print(f"[Network] Replaying {len(self.har_files())} HAR(s) from {self.path} (misses: {self.not_found})")
+        self._prepared = True
+
+    def har_files(self):
+        if not self.path.is_dir():
+            return []
+        return sorted(str(p) for p in self.path.glob("*.zip"))
+
+    def context_options(self):
+        """extra new_context() kwargs - the HAR is written when the context closes"""
+        if self.mode != "record":
+            return {}
+        # one file per context, contexts recycled by the pool get a new one
+        path = self.path / f"context-{os.getpid()}-{next(self._counter)}.zip"
+        return {"record_har_path": str(path), "record_har_content": "attach"}
+
+    async def install(self, context):
+        """in replay mode, answer this context's requests from the archive"""
+        self.metrics["contexts"] += 1
+        if self.mode != "replay":
+            return
+
+        # routes run newest first, so this catch-all only sees what no HAR matched
+        await context.route("**/*", self._handle_miss)
+        for har in self.har_files():
+            await context.route_from_har(har, not_found="fallback")
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats["missed_urls"] = list(self.metrics["missed_urls"])
+        stats["mode"] = self.mode
+        stats["scenario"] = self.scenario
+        return stats
+
+    async def _handle_miss(self, route):
+        url = route.request.url
+        self.metrics["misses"] += 1
+        if len(self.metrics["missed_urls"]) < MAX_MISSED_URLS:
+            self.metrics["missed_urls"].append(url)
+
+        if self.not_found == "fallback":
+            await route.continue_()
+        else:
+            print(f"[Network] Not in archive: {url[:100]}")
+            await route.abort("internetdisconnected")
@@ -0,0 +1,101 @@
+# request interception that blocks stuff we never read (images, fonts, media, trackers)
+# it gets installed on every browser context the pool creates
+
+import re
+import weakref
+from urllib.parse import urlparse
+import config
+
+
+# we abort requests before they download, so we can't know their real size.
+# these are rough averages per resource type, used to estimate the bytes we saved
+ESTIMATED_BYTES = {
+    "image": 25_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 40_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+
+class NetworkFilter:
+    """aborts requests by resource type, url pattern or domain, and counts what it saved"""
+
+    def __init__(self, resource_types=None, domains=None, url_patterns=None, enabled=None):
+        self.enabled = config.BLOCK_RESOURCES if enabled is None else enabled
+        self.resource_types = set(config.BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.domains = tuple(config.BLOCKED_DOMAINS if domains is None else domains)
+        patterns = config.BLOCKED_URL_PATTERNS if url_patterns is None else url_patterns
+        self.url_pattern = re.compile("|".join(patterns)) if patterns else None
+
+        self.totals = self._empty_stats()
+        self._page_stats = weakref.WeakKeyDictionary()
+
+    async def install(self, context):
+        """start filtering every request made by this context"""
+        if self.enabled:
+            await context.route("**/*", self._handle_route)
+
+    def should_block(self, url, resource_type):
+        """returns the reason a request should be blocked, or None to let it through"""
+        if resource_type in self.resource_types:
+            return "resource_type"
+
+        host = urlparse(url).hostname or ""
+        for domain in self.domains:
+            if host == domain or host.endswith("." + domain):
+                return "domain"
+
+        if self.url_pattern and self.url_pattern.search(url):
+            return "url_pattern"
+        return None
+
+    def stats_for(self, page):
+        """requests/bytes saved on a single page"""
+        return dict(self._page_stats.get(page, self._empty_stats()))
+
+    def stats(self):
+        """requests/bytes saved across every page"""
+        return dict(self.totals)
+
+    async def _handle_route(self, route):
+        request = route.request
+        reason = self.should_block(request.url, request.resource_type)
+        page_stats = self._stats_for_request(request)
+
+        if reason is None:
+            for stats in (self.totals, page_stats):
+                if stats is not None:
+                    stats["allowed_requests"] += 1
+            await route.fallback()
+            return
+
+        saved = ESTIMATED_BYTES.get(request.resource_type, DEFAULT_ESTIMATED_BYTES)
+        for stats in (self.totals, page_stats):
+            if stats is not None:
+                stats["blocked_requests"] += 1
+                stats["estimated_bytes_saved"] += saved
+                stats["blocked_by_" + reason] += 1
+        await route.abort("blockedbyclient")
+
+    def _stats_for_request(self, request):
+        # service worker requests don't belong to a page
+        try:
+            page = request.frame.page
+        except Exception:
+            return None
+        if page not in self._page_stats:
+            self._page_stats[page] = self._empty_stats()
+        return self._page_stats[page]
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "allowed_requests": 0,
+            "blocked_requests": 0,
+            "estimated_bytes_saved": 0,
+            "blocked_by_resource_type": 0,
+            "blocked_by_domain": 0,
+            "blocked_by_url_pattern": 0,
+        }
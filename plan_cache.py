@@ -0,0 +1,182 @@
+# caches LLM plans by goal + the structure of the page they were made for
+# two tiers: a small in-memory LRU in front of a sqlite file on disk
+#
+# get/set/invalidate block on sqlite, the *_async versions check the memory tier right away
+# and only go to a worker thread for the disk
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+import config
+
+
+def normalize_goal(goal):
+    return " ".join(goal.lower().split())
+
+
+def page_fingerprint(page_context):
+    """
+    hash of the page's structure - host, path and each element's tag/type/id/name/mcp_id
+
+    visible text, hrefs and query strings change all the time without the layout changing,
+    so they're left out on purpose. mcp_id is in because plans point at elements by it and
+    the registry hands ids out per page load - a cached plan is only reused when every id
+    still belongs to the same element
+    """
+    url = urlparse(page_context.get("url", ""))
+    parts = [url.hostname or "", url.path]
+    for elem in page_context.get("interactive_elements", []):
+        parts.append("|".join([
+            elem.get("tag", ""),
+            elem.get("type", ""),
+            elem.get("id", ""),
+            elem.get("name", ""),
+            str(elem.get("mcp_id", "")),
+        ]))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def plan_key(goal, page_context):
+    return hashlib.sha1(f"{normalize_goal(goal)}\n{page_fingerprint(page_context)}".encode()).hexdigest()
+
+
+class PlanCache:
+    """memory + disk cache of plans, with LRU eviction and a TTL"""
+
+    def __init__(self, path=None, ttl=None, memory_entries=None, max_entries=None):
+        self.path = path or config.PLAN_CACHE_PATH
+        self.ttl = config.PLAN_CACHE_TTL if ttl is None else ttl
+        self.memory_entries = memory_entries or config.PLAN_CACHE_MEMORY_ENTRIES
+        self.max_entries = max_entries or config.PLAN_CACHE_MAX_ENTRIES
+
+        self.memory = OrderedDict()  # key -> (plan, expires)
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db_lock = threading.Lock()  # one connection shared by the worker threads
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS plans (
+                key TEXT PRIMARY KEY,
+                plan TEXT NOT NULL,
+                expires REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.db.commit()
+
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, goal, page_context):
+        """the cached plan for this goal on this page layout, or None"""
+        key = plan_key(goal, page_context)
+        plan = self._memory_get(key)
+        if plan is not None:
+            return plan
+        return self._disk_hit(key, self._load(key))
+
+    async def get_async(self, goal, page_context):
+        """same as get, with the sqlite lookup in a worker thread"""
+        key = plan_key(goal, page_context)
+        plan = self._memory_get(key)
+        if plan is not None:
+            return plan
+        return self._disk_hit(key, await asyncio.to_thread(self._load, key))
+
+    def set(self, goal, page_context, plan):
+        key = plan_key(goal, page_context)
+        expires = time.time() + self.ttl
+        self._remember(key, plan, expires)
+        self._store(key, plan, expires)
+
+    async def set_async(self, goal, page_context, plan):
+        key = plan_key(goal, page_context)
+        expires = time.time() + self.ttl
+        self._remember(key, plan, expires)
+        await asyncio.to_thread(self._store, key, plan, expires)
+
+    def invalidate(self, goal, page_context):
+        """drop a plan (e.g. because it failed when we ran it)"""
+        key = plan_key(goal, page_context)
+        self._forget(key)
+        self._delete(key)
+
+    async def invalidate_async(self, goal, page_context):
+        key = plan_key(goal, page_context)
+        self._forget(key)
+        await asyncio.to_thread(self._delete, key)
+
+    def stats(self):
+        stats = dict(self.metrics)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        return stats
+
+    # internal helpers - the memory tier runs on the caller's thread, _load/_store/_delete
+    # are the only parts that touch sqlite
+
+    def _memory_get(self, key):
+        if key in self.memory:
+            plan, expires = self.memory[key]
+            if time.time() <= expires:
+                self.memory.move_to_end(key)
+                self.metrics["memory_hits"] += 1
+                return plan
+            del self.memory[key]
+        return None
+
+    def _disk_hit(self, key, row):
+        """count a disk lookup and copy a hit into memory"""
+        if row is None:
+            self.metrics["misses"] += 1
+            return None
+        plan, expires = row
+        self._remember(key, plan, expires)
+        self.metrics["disk_hits"] += 1
+        return plan
+
+    def _forget(self, key):
+        self.memory.pop(key, None)
+        self.metrics["invalidations"] += 1
+
+    def _load(self, key):
+        """(plan, expires) from disk if it's there and not expired, else None"""
+        now = time.time()
+        with self._db_lock:
+            row = self.db.execute("SELECT plan, expires FROM plans WHERE key = ?", (key,)).fetchone()
+            if not row or now > row[1]:
+                return None
+            self.db.execute("UPDATE plans SET last_access = ? WHERE key = ?", (now, key))
+            self.db.commit()
+        return json.loads(row[0]), row[1]
+
+    def _store(self, key, plan, expires):
+        with self._db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO plans (key, plan, expires, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(plan), expires, time.time()),
+            )
+            self.db.execute("""
+                DELETE FROM plans WHERE key IN (
+                    SELECT key FROM plans ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self.db.commit()
+
+    def _delete(self, key):
+        with self._db_lock:
+            self.db.execute("DELETE FROM plans WHERE key = ?", (key,))
+            self.db.commit()
+
+    def _remember(self, key, plan, expires):
+        self.memory[key] = (plan, expires)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
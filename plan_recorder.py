@@ -0,0 +1,138 @@
+# record successful AI runs as parameterized scripts, and replay them without the LLM
+#
+# "search for dinosaurs on amazon" that filled "dinosaurs" into the search box becomes the
+# template "search for {text0} on amazon", so "search for lamps on amazon" can reuse the
+# same steps with "lamps" filled in instead
+
+import json
+import os
+import re
+from urllib.parse import urlparse
+import config
+
+
+# a selector for an element that will still work on a fresh copy of the page
+# (unlike data-mcp-id, which only lives as long as the page does). null if there isn't one
+STABLE_SELECTOR_JS = """
+    (el) => {
+        const unique = (selector) => document.querySelectorAll(selector).length === 1 ? selector : null;
+        const tag = el.tagName.toLowerCase();
+        if (el.id) {
+            const byId = unique('#' + CSS.escape(el.id));
+            if (byId) return byId;
+        }
+        for (const attr of ['name', 'aria-label', 'placeholder']) {
+            const value = el.getAttribute(attr);
+            if (value) {
+                const byAttr = unique(`${tag}[${attr}="${CSS.escape(value)}"]`);
+                if (byAttr) return byAttr;
+            }
+        }
+        return null;
+    }
+"""
+
+
+def normalize_goal(goal):
+    return " ".join(goal.lower().split())
+
+
+def word_pattern(text):
+    """whole-word regex for text, so a fill of "lamp" never matches inside lamps"""
+    return rf"(?<!\w){re.escape(text)}(?!\w)"
+
+
+def site_of(url):
+    return (urlparse(url or "").hostname or "").removeprefix("www.")
+
+
+async def stable_selector(page, selector):
+    """a selector for whatever `selector` points at that will work on a fresh page, or None"""
+    try:
+        return await page.eval_on_selector(selector, STABLE_SELECTOR_JS)
+    except Exception:
+        return None
+
+
+class PlanRecorder:
+    """stores recorded scripts in a small json file and matches new goals against them"""
+
+    def __init__(self, path=None):
+        self.path = path or config.SCRIPTS_PATH
+        self.scripts = []
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.scripts = json.load(f)
+
+    def record(self, goal, url, trace):
+        """
+        save a successful run
+
+        trace is a list of steps with stable selectors, like
+            {"action": "fill", "selector": "#twotabsearchtextbox", "text": "dinosaurs"}
+        returns the script, or None if the run can't be replayed (an element had no stable selector)
+        """
+        if not trace or any(step["action"] in ("fill", "click") and not step.get("selector") for step in trace):
+            return None
+
+        template = normalize_goal(goal)
+        steps = []
+        slot = 0
+        for step in trace:
+            step = dict(step)
+            text = step.get("text", "")
+            # text typed in that came straight from the goal becomes a slot - whole words only,
+            # or a short fill like "a" would cut a slot out of the middle of another word
+            if step["action"] == "fill" and text and re.search(word_pattern(text.lower()), template):
+                name = f"{{text{slot}}}"
+                template = re.sub(word_pattern(text.lower()), lambda _: name, template, count=1)
+                step["text"] = name
+                slot += 1
+            steps.append(step)
+
+        script = {"template": template, "site": site_of(url), "steps": steps, "successes": 0, "failures": 0}
+        self.scripts = [s for s in self.scripts if (s["template"], s["site"]) != (template, script["site"])]
+        self.scripts.append(script)
+        self._save()
+        print(f"[Recorder] Saved script for '{template}'")
+        return script
+
+    def match(self, goal, url):
+        """the first script whose template fits the goal on this site, as (script, steps) or (None, None)"""
+        goal = normalize_goal(goal)
+        for script in self.scripts:
+            if script["site"] != site_of(url):
+                continue
+
+            pattern = re.escape(script["template"])
+            slots = re.findall(r"\\\{(text\d+)\\\}", pattern)
+            for name in slots:
+                pattern = pattern.replace(f"\\{{{name}\\}}", f"(?P<{name}>.+?)", 1)
+            found = re.fullmatch(pattern, goal)
+            if found:
+                return script, self._fill_slots(script["steps"], found.groupdict())
+        return None, None
+
+    def report(self, script, success):
+        """keep score for a script, dropping it once it fails too often"""
+        script["successes" if success else "failures"] += 1
+        if script["failures"] >= config.REPLAY_MAX_FAILURES:
+            self.scripts.remove(script)
+            print(f"[Recorder] Dropped script for '{script['template']}' after {script['failures']} failures")
+        self._save()
+
+    @staticmethod
+    def _fill_slots(steps, values):
+        filled = []
+        for step in steps:
+            step = dict(step)
+            if "text" in step:
+                for name, value in values.items():
+                    step["text"] = step["text"].replace(f"{{{name}}}", value)
+            filled.append(step)
+        return filled
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.scripts, f, indent=2)
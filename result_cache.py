@@ -0,0 +1,184 @@
+# sqlite backed cache for search results so repeat queries skip the browser
+# entries have a TTL, the table is LRU bounded, and stale entries can be served while they refresh
+#
+# get/set/delete are plain blocking calls (safe from any thread), get_or_fetch runs them in a
+# worker thread so a slow disk never stalls the event loop
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+import config
+
+
+def normalize_query(query):
+    """lowercase and collapse whitespace so "T-Rex  Toy" and "t-rex toy" share an entry"""
+    return " ".join(query.lower().split())
+
+
+class ResultCache:
+    """
+    usage:
+        cache = ResultCache()
+        product = await cache.get_or_fetch("dinosaur", fetch_function)
+    """
+
+    def __init__(self, path=None, ttl=None, stale_seconds=None, max_entries=None):
+        self.path = path or config.RESULT_CACHE_PATH
+        self.ttl = config.RESULT_CACHE_TTL if ttl is None else ttl
+        self.stale_seconds = config.RESULT_CACHE_STALE_SECONDS if stale_seconds is None else stale_seconds
+        self.max_entries = max_entries or config.RESULT_CACHE_MAX_ENTRIES
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db_lock = threading.RLock()  # one connection shared by the worker threads
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                expires REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        self.db.commit()
+
+        self._in_flight = {}  # key -> the one fetch (miss or background refresh) running for it
+        self.metrics = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "shared_fetches": 0,  # misses that waited on a fetch already in flight instead of starting one
+            "refreshes": 0,
+            "hit_latency_total": 0.0,
+            "miss_latency_total": 0.0,
+        }
+
+    def get(self, query):
+        """
+        look up a query
+
+        returns (record, state) where state is "fresh", "stale" or "miss"
+        """
+        key = normalize_query(query)
+        with self._db_lock:
+            row = self.db.execute("SELECT record, expires FROM results WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None, "miss"
+
+            record, expires = row
+            now = time.time()
+            if now > expires + self.stale_seconds:
+                self.delete(query)
+                return None, "miss"
+
+            self.db.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self.db.commit()
+        return json.loads(record), "fresh" if now <= expires else "stale"
+
+    def set(self, query, record, ttl=None):
+        """store a record, evicting the least recently used entries if we're over the limit"""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results (key, record, expires, last_access) VALUES (?, ?, ?, ?)",
+                (normalize_query(query), json.dumps(record), now + ttl, now),
+            )
+            self.db.execute("""
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self.db.commit()
+
+    def delete(self, query):
+        with self._db_lock:
+            self.db.execute("DELETE FROM results WHERE key = ?", (normalize_query(query),))
+            self.db.commit()
+
+    async def get_or_fetch(self, query, fetch):
+        """
+        return the cached record for a query, or call `await fetch(query)` and cache what it returns
+
+        stale records are returned right away and refreshed in the background.
+        concurrent misses for the same query share one fetch. failed fetches (None) are not cached
+        """
+        start = time.perf_counter()
+        record, state = await asyncio.to_thread(self.get, query)
+
+        if state != "miss":
+            if state == "fresh":
+                self.metrics["hits"] += 1
+            else:
+                self.metrics["stale_hits"] += 1
+                self._refresh_in_background(query, fetch)
+            self.metrics["hit_latency_total"] += time.perf_counter() - start
+            return record
+
+        self.metrics["misses"] += 1
+        task = self._in_flight.get(normalize_query(query))
+        if task:
+            self.metrics["shared_fetches"] += 1
+        else:
+            task = self._start_fetch(query, fetch)
+        # shielded so one caller giving up doesn't cancel the fetch for everyone else waiting on it
+        record = await asyncio.shield(task)
+        self.metrics["miss_latency_total"] += time.perf_counter() - start
+        return record
+
+    def stats(self):
+        """hit/miss counts, hit rate and average latencies"""
+        stats = dict(self.metrics)
+        hits = stats["hits"] + stats["stale_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        stats["hit_latency_avg"] = stats["hit_latency_total"] / hits if hits else 0.0
+        stats["miss_latency_avg"] = stats["miss_latency_total"] / stats["misses"] if stats["misses"] else 0.0
+        with self._db_lock:
+            stats["entries"] = self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return stats
+
+    async def wait_for_refreshes(self):
+        """wait for any background refreshes (or other fetches) still running (handy before closing)"""
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+
+    def close(self):
+        for task in self._in_flight.values():
+            task.cancel()
+        with self._db_lock:
+            self.db.close()
+
+    # internal helpers
+
+    def _start_fetch(self, query, fetch):
+        """run fetch(query) once and cache the result - everyone after this key joins the same task"""
+        key = normalize_query(query)
+
+        async def fetch_and_store():
+            record = await fetch(query)
+            if record is not None:
+                await asyncio.to_thread(self.set, query, record)
+            return record
+
+        task = self._in_flight[key] = asyncio.create_task(fetch_and_store())
+        task.add_done_callback(lambda t: self._in_flight.pop(key, None) if self._in_flight.get(key) is t else None)
+        return task
+
+    def _refresh_in_background(self, query, fetch):
+        if normalize_query(query) in self._in_flight:
+            return  # someone is already fetching this one
+        self._start_fetch(query, fetch).add_done_callback(partial(self._refresh_done, query))
+
+    def _refresh_done(self, query, task):
+        if task.cancelled():
+            return
+        if task.exception():
+            print(f"[Cache] Background refresh failed for '{query}': {task.exception()}")
+        elif task.result() is not None:
+            self.metrics["refreshes"] += 1
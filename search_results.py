@@ -0,0 +1,67 @@
+# bulk extraction of amazon search results
+# pulls every result card out in a single page.evaluate instead of one round trip per field
+
+RESULT_SELECTOR = "[data-component-type='s-search-result']"
+NEXT_PAGE_SELECTOR = "a.s-pagination-next"
+
+# runs in the browser - one pass over the result cards, building small plain records
+EXTRACT_RESULTS_JS = """
+    ([resultSelector, limit]) => {
+        const records = [];
+        for (const card of document.querySelectorAll(resultSelector)) {
+            if (limit && records.length >= limit) break;
+
+            const text = (selector) => {
+                const el = card.querySelector(selector);
+                return el ? el.textContent.trim() : '';
+            };
+            const rating = text('.a-icon-star-small .a-icon-alt, .a-icon-star .a-icon-alt, .a-icon-alt');
+            const sponsoredLabel = text('.puis-sponsored-label-text, .s-sponsored-label-text, .puis-label-popover-default');
+
+            records.push({
+                position: records.length + 1,
+                asin: card.getAttribute('data-asin') || '',
+                title: text('h2'),
+                price_whole: text('.a-price:not(.a-text-price) .a-price-whole').replace(/[.,]$/, ''),
+                price_fraction: text('.a-price:not(.a-text-price) .a-price-fraction'),
+                rating: (rating.match(/[0-9.]+/) || [''])[0],
+                sponsored: /sponsored/i.test(sponsoredLabel),
+            });
+        }
+        return records;
+    }
+"""
+
+
+async def extract_search_results(page, limit=None):
+    """
+    get every search result on the page in one round trip
+
+    returns list of dicts like:
+        {"position": 1, "asin": "B0...", "title": "...", "price_whole": "19", "price_fraction": "99",
+         "rating": "4.6", "sponsored": False}
+    """
+    try:
+        return await page.evaluate(EXTRACT_RESULTS_JS, [RESULT_SELECTOR, limit or 0])
+    except Exception as e:
+        print(f"[Failure] failed to extract search results: {e}")
+        return []
+
+
+async def get_next_page_url(page):
+    """url of the next results page, or None if this is the last one"""
+    try:
+        return await page.evaluate(
+            "(selector) => document.querySelector(selector)?.href || null", NEXT_PAGE_SELECTOR
+        )
+    except Exception as e:
+        print(f"[Failure] failed to find next page link: {e}")
+        return None
+
+
+def first_product(records):
+    """the first result that has both a title and a price, in get_first_product_info's shape"""
+    for record in records:
+        if record["title"] and record["price_whole"]:
+            return {"name": record["title"], "price": record["price_whole"]}
+    return None
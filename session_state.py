@@ -0,0 +1,122 @@
+# saved browser sessions so pooled contexts don't start from an empty profile every run
+#
+# every pool slot gets its own session under SESSION_DIR/slot-N/:
+#   state.json  - cookies + localStorage (playwright storageState), restored into new contexts
+#   profile/    - a whole chromium user-data dir (disk cache included) if SESSION_PERSISTENT is on
+#   meta.json   - when the session was created / last saved, used for expiry
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+import config
+
+
+class SessionStore:
+    """saves and restores per-slot browser sessions, with expiry and per-slot invalidation"""
+
+    def __init__(self, path=None, ttl=None, persistent=None, enabled=None, save_interval=None):
+        self.path = Path(path or config.SESSION_DIR)
+        self.ttl = config.SESSION_TTL if ttl is None else ttl
+        self.enabled = config.SESSION_STATE if enabled is None else enabled
+        self.persistent = self.enabled and (config.SESSION_PERSISTENT if persistent is None else persistent)
+        self.save_interval = config.SESSION_SAVE_INTERVAL if save_interval is None else save_interval
+
+        self._generations = {}  # slot -> bumped on invalidate so live leases know they're stale
+        self._last_save = {}
+        self.metrics = {"warm": 0, "cold": 0, "saves": 0, "expired": 0, "invalidated": 0}
+
+    def slot_dir(self, slot):
+        return self.path / f"slot-{slot}"
+
+    def context_options(self, slot):
+        """new_context() kwargs that restore this slot's saved cookies/storage"""
+        if not self.enabled or self.persistent:
+            return {}
+        self._expire(slot)
+        state = self.slot_dir(slot) / "state.json"
+        if state.exists():
+            self.metrics["warm"] += 1
+            return {"storage_state": str(state)}
+        self.metrics["cold"] += 1
+        return {}
+
+    def profile_dir(self, slot):
+        """user-data dir for launch_persistent_context (SESSION_PERSISTENT mode)"""
+        self._expire(slot)
+        profile = self.slot_dir(slot) / "profile"
+        if profile.is_dir() and any(profile.iterdir()):
+            self.metrics["warm"] += 1
+        else:
+            self.metrics["cold"] += 1
+            profile.mkdir(parents=True, exist_ok=True)
+            self._write_meta(slot, created=time.time())
+        return str(profile)
+
+    async def save(self, context, slot, force=False):
+        """write the context's storage state, at most once per save_interval unless forced"""
+        if not self.enabled or slot is None:
+            return
+        now = time.time()
+        if not force and now - self._last_save.get(slot, 0) < self.save_interval:
+            return
+        self._last_save[slot] = now
+
+        # persistent profiles save themselves, only the timestamps need updating
+        if not self.persistent:
+            try:
+                state = await context.storage_state()
+                # written to a temp file first - other processes may be reading this slot right now
+                self.slot_dir(slot).mkdir(parents=True, exist_ok=True)
+                tmp = self.slot_dir(slot) / f"state.json.{os.getpid()}.tmp"
+                tmp.write_text(json.dumps(state))
+                os.replace(tmp, self.slot_dir(slot) / "state.json")
+            except Exception as e:
+                print(f"[Session] Couldn't save slot {slot}: {e}")
+                return
+        self.metrics["saves"] += 1
+        self._write_meta(slot, saved=now)
+
+    def invalidate(self, slot=None):
+        """throw away one slot's session (or every slot's) - e.g. after a captcha or a logout"""
+        slots = [slot] if slot is not None else [
+            int(p.name.split("-", 1)[1]) for p in self.path.glob("slot-*") if p.name.split("-", 1)[1].isdigit()
+        ]
+        for s in slots:
+            shutil.rmtree(self.slot_dir(s), ignore_errors=True)
+            self._generations[s] = self._generations.get(s, 0) + 1
+            self._last_save.pop(s, None)
+            self.metrics["invalidated"] += 1
+            print(f"[Session] Invalidated slot {s}")
+
+    def generation(self, slot):
+        return self._generations.get(slot, 0)
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats["persistent"] = self.persistent
+        return stats
+
+    # internal helpers
+
+    def _expire(self, slot):
+        meta = self._read_meta(slot)
+        if meta and time.time() - meta.get("created", 0) > self.ttl:
+            shutil.rmtree(self.slot_dir(slot), ignore_errors=True)
+            self.metrics["expired"] += 1
+            print(f"[Session] Slot {slot} expired, starting fresh")
+        if not self._read_meta(slot):
+            self._write_meta(slot, created=time.time())
+
+    def _read_meta(self, slot):
+        try:
+            return json.loads((self.slot_dir(slot) / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, slot, **fields):
+        meta = self._read_meta(slot) or {}
+        meta.update(fields)
+        self.slot_dir(slot).mkdir(parents=True, exist_ok=True)
+        (self.slot_dir(slot) / "meta.json").write_text(json.dumps(meta))
@@ -0,0 +1,163 @@
+# adaptive timeouts - learned from how long things actually take instead of a flat 30s/10s
+#
+# every utils wrapper reports how long its wait took, keyed by action, domain and selector.
+# the next timeout for that key is the rolling p99 * multiplier + margin, kept between a floor
+# and a ceiling (the old fixed timeouts), so a selector that normally shows up in 200ms stops
+# stalling a worker for 10s when it's missing.
+#
+# usage:
+#     with timeouts.watch("click", page.url, selector, timeout) as watch:
+#         await page.wait_for_selector(selector, timeout=watch.timeout)
+#
+#     timeouts.print_estimates()
+
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
+import config
+
+
+def _domain(url):
+    return urlparse(url or "").hostname or ""
+
+
+def _levels(action, domain, selector):
+    """
+    most specific key first: this selector on this domain, then the action anywhere on the domain.
+    there's deliberately no cross-domain level - one site's latencies say nothing about another's
+    """
+    return list(dict.fromkeys(((action, domain, selector), (action, domain, None))))
+
+
+class Watch:
+    """times one wait and reports it back to the manager when the block exits"""
+
+    __slots__ = ("manager", "key", "timeout", "start", "_timed_out")
+
+    def __init__(self, manager, key, timeout):
+        self.manager = manager
+        self.key = key
+        self.timeout = timeout
+        self.start = None
+        self._timed_out = False
+
+    def timed_out(self):
+        """for waits that report failure by returning instead of raising"""
+        self._timed_out = True
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = (time.perf_counter() - self.start) * 1000
+        # a timeout only tells us it took at least as long as we waited, not how long it takes -
+        # fed into the p99 it would get multiplied up until a missing selector waits the full
+        # ceiling again (and drags every other selector on the site up with it), so it's left out.
+        # playwright's TimeoutError is checked by name so we don't have to import playwright here
+        if exc_type is None and not self._timed_out:
+            self.manager.record(self.key, elapsed)
+        return False
+
+
+class TimeoutManager:
+    """rolling latency windows per (action, domain, selector), turned into timeouts"""
+
+    def __init__(self, enabled=None):
+        self.enabled = config.ADAPTIVE_TIMEOUTS if enabled is None else enabled
+        self._windows = OrderedDict()  # key -> deque of recent latencies (ms)
+        self._cache = {}               # key -> timeout, until the next sample for that key
+
+    def ceiling(self, action):
+        return config.TIMEOUT if action == "goto" else config.ELEMENT_TIMEOUT
+
+    def timeout_for(self, action, url=None, selector=None):
+        """
+        timeout (ms) for this action - from the most specific key that has enough samples:
+        action + domain + selector, then action + domain, then the ceiling
+        """
+        if not self.enabled:
+            return self.ceiling(action)
+        for key in _levels(action, _domain(url), selector):
+            timeout = self._estimate(key)
+            if timeout:
+                return timeout
+        return self.ceiling(action)
+
+    def watch(self, action, url=None, selector=None, timeout=None):
+        """context manager that times a wait - an explicit timeout is used as is, but still recorded"""
+        key = (action, _domain(url), selector)
+        return Watch(self, key, timeout if timeout is not None else self.timeout_for(action, url, selector))
+
+    def record(self, key, elapsed_ms):
+        """add one observed wait (ms) for key = (action, domain, selector) to every level it feeds"""
+        for level in _levels(*key):
+            self._add(level, elapsed_ms)
+
+    def estimates(self):
+        """current numbers for every key, most recently used last"""
+        rows = []
+        for key, window in self._windows.items():
+            action, domain, selector = key
+            ordered = sorted(window)
+            rows.append({
+                "action": action,
+                "domain": domain,
+                "selector": selector,
+                "samples": len(ordered),
+                "p50_ms": self._percentile(ordered, 0.50),
+                "p99_ms": self._percentile(ordered, config.TIMEOUT_PERCENTILE),
+                "timeout_ms": self._estimate(key) or self.ceiling(action),
+            })
+        return rows
+
+    def print_estimates(self):
+        print("\n" + "="*90)
+        print("ADAPTIVE TIMEOUTS")
+        print("="*90)
+        print(f"{'action':<14} {'domain':<22} {'selector':<24} {'n':>5} {'p50':>8} {'p99':>8} {'timeout':>9}")
+        for row in self.estimates():
+            print(f"{row['action']:<14} {(row['domain'] or '*')[:22]:<22} {(row['selector'] or '*')[:24]:<24} "
+                  f"{row['samples']:>5} {row['p50_ms']:>8.0f} {row['p99_ms']:>8.0f} {row['timeout_ms']:>9.0f}")
+        print("="*90 + "\n")
+
+    def reset(self):
+        self._windows.clear()
+        self._cache.clear()
+
+    # internal helpers
+
+    def _add(self, key, elapsed_ms):
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = deque(maxlen=config.TIMEOUT_WINDOW)
+            if len(self._windows) > config.TIMEOUT_MAX_KEYS:
+                old_key, _ = self._windows.popitem(last=False)
+                self._cache.pop(old_key, None)
+        else:
+            self._windows.move_to_end(key)
+        window.append(elapsed_ms)
+        self._cache.pop(key, None)
+
+    def _estimate(self, key):
+        """p99 * multiplier + margin between floor and ceiling, or None without enough samples"""
+        if key in self._cache:
+            return self._cache[key]
+        window = self._windows.get(key)
+        if not window or len(window) < config.TIMEOUT_MIN_SAMPLES:
+            return None
+        p99 = self._percentile(sorted(window), config.TIMEOUT_PERCENTILE)
+        timeout = p99 * config.TIMEOUT_MULTIPLIER + config.TIMEOUT_MARGIN_MS
+        timeout = int(min(max(timeout, config.TIMEOUT_FLOOR_MS), self.ceiling(key[0])))
+        self._cache[key] = timeout
+        return timeout
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        if not ordered:
+            return 0.0
+        return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+# one shared manager, so every wrapper learns from every other caller
+timeouts = TimeoutManager()
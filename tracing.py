@@ -0,0 +1,240 @@
+# lightweight tracing - nested timing spans we can dump to JSONL or chrome://tracing
+#
+# usage:
+#     with span("get_page_context", url=page.url) as s:
+#         ...
+#         s.set(elements=len(elements))
+#
+#     @traced("safe_click", "selector")
+#     async def safe_click(page, selector): ...
+#
+#     tracer.export_chrome_trace("trace.json")   # open in chrome://tracing or ui.perfetto.dev
+#
+# when tracing is off, span() hands back one shared do-nothing object, so the cost is a
+# single attribute check per call
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import os
+import time
+import config
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """one timed operation - set() attaches extra attributes like bytes or token counts"""
+
+    __slots__ = ("tracer", "name", "attrs", "id", "parent", "start", "duration", "outcome", "lane", "_token")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.id = None
+        self.parent = None
+        self.start = None
+        self.duration = None
+        self.outcome = "ok"
+        self.lane = 0
+        self._token = None
+
+    def set(self, **attrs):
+        if "outcome" in attrs:
+            self.outcome = attrs.pop("outcome")
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent = parent.id if parent else None
+        self.id = self.tracer._next_id()
+        self.lane = self.tracer._lane()
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # exited from a different context than we entered in (e.g. across an async generator)
+            _current_span.set(None)
+        if exc_type is not None:
+            self.outcome = "cancelled" if exc_type is asyncio.CancelledError else "error"
+            self.attrs["error"] = str(exc)[:200]
+        self.tracer._finish(self)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class _NoopSpan:
+    """what span() returns when tracing is off"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """collects finished spans and exports them"""
+
+    def __init__(self, enabled=None):
+        self.enabled = config.TRACING if enabled is None else enabled
+        self.spans = []
+        self._ids = 0
+        self._lanes = {}
+        self._origin = time.perf_counter()
+        self._origin_epoch = time.time()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def clear(self):
+        self.spans = []
+        self._lanes = {}
+
+    def summary(self):
+        """per span name: count, total, average, p50, p95 and max duration in ms, plus failures"""
+        by_name = {}
+        for s in self.spans:
+            by_name.setdefault(s.name, []).append(s)
+
+        summary = {}
+        for name, spans in by_name.items():
+            durations = sorted(s.duration * 1000 for s in spans)
+            summary[name] = {
+                "count": len(spans),
+                "total_ms": sum(durations),
+                "avg_ms": sum(durations) / len(durations),
+                "p50_ms": durations[len(durations) // 2],
+                "p95_ms": durations[min(int(len(durations) * 0.95), len(durations) - 1)],
+                "max_ms": durations[-1],
+                "failures": sum(1 for s in spans if s.outcome != "ok"),
+            }
+        return summary
+
+    def print_summary(self):
+        print("\n" + "="*60)
+        print("TRACE SUMMARY (slowest total first)")
+        print("-"*60)
+        rows = sorted(self.summary().items(), key=lambda item: -item[1]["total_ms"])
+        for name, row in rows:
+            print(f"{name:<28} {row['count']:>5}x  total {row['total_ms']:>9.1f} ms  "
+                  f"p50 {row['p50_ms']:>8.1f} ms  failed {row['failures']}")
+        print("="*60 + "\n")
+
+    def export_jsonl(self, path):
+        """one JSON object per span"""
+        with open(path, "w") as f:
+            for s in self.spans:
+                f.write(json.dumps({
+                    "name": s.name,
+                    "id": s.id,
+                    "parent": s.parent,
+                    "start": self._origin_epoch + (s.start - self._origin),
+                    "duration_ms": s.duration * 1000,
+                    "outcome": s.outcome,
+                    **s.attrs,
+                }, default=str) + "\n")
+
+    def export_chrome_trace(self, path):
+        """chrome trace-event format - each concurrent task gets its own row"""
+        events = [{
+            "name": s.name,
+            "cat": s.name.split(".")[0],
+            "ph": "X",
+            "ts": (s.start - self._origin) * 1_000_000,
+            "dur": s.duration * 1_000_000,
+            "pid": os.getpid(),
+            "tid": s.lane,
+            "args": {"outcome": s.outcome, **s.attrs},
+        } for s in self.spans]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def _next_id(self):
+        self._ids += 1
+        return self._ids
+
+    def _lane(self):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task else 0
+        if key not in self._lanes:
+            self._lanes[key] = len(self._lanes)
+        return self._lanes[key]
+
+    def _finish(self, s):
+        self.spans.append(s)
+
+
+tracer = Tracer()
+
+
+def span(name, **attrs):
+    """start a span on the global tracer (use with `with` or `async with`)"""
+    if not tracer.enabled:
+        return NOOP_SPAN
+    return Span(tracer, name, attrs)
+
+
+def current_span():
+    """the span we're inside right now (a do-nothing span if there isn't one)"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name, *arg_names):
+    """
+    decorator that wraps an async function in a span
+
+    arg_names are parameters to copy onto the span (like "selector"). a falsy return value
+    (our safe_* wrappers return False/None when they fail) marks the span as a failure
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+
+            attrs = {}
+            if arg_names:
+                bound = signature.bind_partial(*args, **kwargs)
+                attrs = {arg: bound.arguments[arg] for arg in arg_names if arg in bound.arguments}
+            with Span(tracer, name, attrs) as s:
+                result = await func(*args, **kwargs)
+                if not result and result != []:
+                    s.outcome = "failure"
+                return result
+        return wrapper
+    return decorate
@@ -1,20 +1,42 @@
 # these are some safeguard functions to help with errors
 
-async def safe_goto(page, url, timeout=30000):
+import asyncio
+from timeouts import timeouts
+from tracing import traced, tracer, current_span
+import config
+
+# timeout=None everywhere below means "let the timeout manager decide" (see timeouts.py) -
+# a learned p99 + margin for this action/domain/selector, capped at the old fixed timeouts
+
+
+@traced("safe_goto", "url")
+async def safe_goto(page, url, timeout=None):
     """Navigate to URL, return True if success, False if failed"""
     try:
-        await page.goto(url, timeout=timeout)
-        print(f"[Success] navigated to {url}")
-        return True
+        with timeouts.watch("goto", url, None, timeout) as watch:
+            response = await page.goto(url, timeout=watch.timeout)
     except Exception as e:
         print(f"[Failure] failed to navigate: {e}")
         return False
 
+    if tracer.enabled and response:
+        # how big the page was - only worth the extra round trip when we're tracing.
+        # best effort: fulfilled/replayed/aborted responses may not have sizes
+        try:
+            sizes = await response.request.sizes()
+            current_span().set(status=response.status, bytes=sizes["responseBodySize"] + sizes["responseHeadersSize"])
+        except Exception:
+            current_span().set(status=response.status)
+    print(f"[Success] navigated to {url}")
+    return True
+
 
-async def safe_click(page, selector, timeout=10000):
+@traced("safe_click", "selector")
+async def safe_click(page, selector, timeout=None):
     """Click an element, return True if success, False if failed"""
     try:
-        await page.wait_for_selector(selector, timeout=timeout)
+        with timeouts.watch("click", page.url, selector, timeout) as watch:
+            await page.wait_for_selector(selector, timeout=watch.timeout)
         await page.click(selector)
         print(f"[Success] clicked {selector}")
         return True
@@ -23,10 +45,12 @@ async def safe_click(page, selector, timeout=10000):
         return False
 
 
-async def safe_fill(page, selector, text, timeout=10000):
+@traced("safe_fill", "selector")
+async def safe_fill(page, selector, text, timeout=None):
     """Fill an input field, return True if success, False if failed"""
     try:
-        await page.wait_for_selector(selector, timeout=timeout)
+        with timeouts.watch("fill", page.url, selector, timeout) as watch:
+            await page.wait_for_selector(selector, timeout=watch.timeout)
         await page.fill(selector, text)
         print(f"[Success] filled {selector}")
         return True
@@ -35,10 +59,12 @@ async def safe_fill(page, selector, text, timeout=10000):
         return False
 
 
-async def safe_get_text(page, selector, timeout=10000):
+@traced("safe_get_text", "selector")
+async def safe_get_text(page, selector, timeout=None):
     """Get text from an element, return text or None if failed"""
     try:
-        await page.wait_for_selector(selector, timeout=timeout)
+        with timeouts.watch("get_text", page.url, selector, timeout) as watch:
+            await page.wait_for_selector(selector, timeout=watch.timeout)
         text = await page.text_content(selector)
         return text
     except Exception as e:
@@ -49,16 +75,126 @@ async def safe_get_text(page, selector, timeout=10000):
 async def see_page_elements(page, selector):
     """find and print elements that match a selector"""
     try:
-        elements = await page.query_selector_all(selector)
-        print(f"\n[Debug] Found {len(elements)} elements matching '{selector}'")
+        # one round trip for the count and the first 10 texts, instead of one per element
+        count, texts = await page.eval_on_selector_all(selector, """
+            (elements) => [elements.length, elements.slice(0, 10).map(el => el.textContent)]
+        """)
+        print(f"\n[Debug] Found {count} elements matching '{selector}'")
         
-        for i, elem in enumerate(elements[:10]):  # Show first 10
-            text = await elem.text_content()
+        for i, text in enumerate(texts):  # Show first 10
             text = text.strip()[:100] if text else "(no text)"
             print(f"  [{i+1}] {text}")
         
-        return len(elements)
+        return count
     except Exception as e:
         print(f"[Debug] Error: {e}")
         return 0
 
+
+# readiness helpers - these replace fixed asyncio.sleep() calls so we move on
+# the moment the page is actually ready instead of always waiting the worst case
+
+async def wait_for_load(page, state="domcontentloaded", timeout=None):
+    """wait for a load state ("load", "domcontentloaded" or "networkidle"), return True/False"""
+    try:
+        with timeouts.watch("load:" + state, page.url, None, timeout) as watch:
+            await page.wait_for_load_state(state, timeout=watch.timeout)
+        return True
+    except Exception as e:
+        print(f"[Failure] page never reached {state}: {e}")
+        return False
+
+
+async def wait_for_network_idle(page, timeout=None):
+    """wait until there are no network requests for a bit, return True/False"""
+    return await wait_for_load(page, "networkidle", timeout)
+
+
+async def wait_for_element(page, selector, state="visible", timeout=None):
+    """wait for an element to show up (or "attached", "hidden", "detached"), return True/False"""
+    try:
+        with timeouts.watch("element:" + state, page.url, selector, timeout) as watch:
+            await page.wait_for_selector(selector, state=state, timeout=watch.timeout)
+        return True
+    except Exception as e:
+        print(f"[Failure] {selector} never became {state}: {e}")
+        return False
+
+
+async def wait_for_url_change(page, old_url, timeout=None):
+    """wait until the page navigates away from old_url, return True/False"""
+    try:
+        with timeouts.watch("url_change", old_url, None, timeout) as watch:
+            await page.wait_for_url(lambda url: url != old_url, wait_until="commit", timeout=watch.timeout)
+        return True
+    except Exception as e:
+        print(f"[Failure] url never changed from {old_url}: {e}")
+        return False
+
+
+async def wait_for_dom_quiet(page, quiet_ms=300, timeout=None):
+    """
+    wait until the DOM stops changing for quiet_ms, return True/False
+
+    if the page navigates while we're watching, we wait for the new page to load instead
+    """
+    # this is a settle window more than a wait, so it's only capped, not learned
+    timeout = timeout or config.ELEMENT_TIMEOUT
+    try:
+        return await page.evaluate("""
+            ([quietMs, maxMs]) => new Promise(resolve => {
+                let timer = null;
+                const finish = (result) => {
+                    observer.disconnect();
+                    clearTimeout(timer);
+                    clearTimeout(deadline);
+                    resolve(result);
+                };
+                const observer = new MutationObserver(() => {
+                    clearTimeout(timer);
+                    timer = setTimeout(() => finish(true), quietMs);
+                });
+                observer.observe(document, {childList: true, subtree: true});
+                timer = setTimeout(() => finish(true), quietMs);
+                const deadline = setTimeout(() => finish(false), maxMs);
+            })
+        """, [quiet_ms, timeout])
+    except Exception:
+        # the execution context goes away when the page navigates
+        return await wait_for_load(page, "domcontentloaded", timeout)
+
+
+@traced("wait_for_ready", "load_state", "selector", "dom_quiet_ms")
+async def wait_for_ready(page, load_state=None, selector=None, url_change_from=None,
+                         dom_quiet_ms=None, timeout=None):
+    """
+    wait for every condition given, all sharing one deadline
+
+    args passed in:
+        load_state: "load", "domcontentloaded" or "networkidle"
+        selector: an element that should be visible
+        url_change_from: the url we expect to navigate away from
+        dom_quiet_ms: how long the DOM should be still before we call it settled
+        timeout: total time for all of the conditions together (ms), learned per page + selector if None
+
+    returns True if everything was ready before the deadline, False otherwise
+    """
+    loop = asyncio.get_running_loop()
+    with timeouts.watch("ready", url_change_from or page.url, selector, timeout) as watch:
+        deadline = loop.time() + watch.timeout / 1000
+
+        def remaining():
+            return max(int((deadline - loop.time()) * 1000), 1)
+
+        ready = True
+        if url_change_from is not None:
+            ready = await wait_for_url_change(page, url_change_from, remaining()) and ready
+        if load_state:
+            ready = await wait_for_load(page, load_state, remaining()) and ready
+        if selector:
+            ready = await wait_for_element(page, selector, timeout=remaining()) and ready
+        if dom_quiet_ms:
+            ready = await wait_for_dom_quiet(page, dom_quiet_ms, remaining()) and ready
+        if not ready:
+            watch.timed_out()
+    return ready